@@ -5,6 +5,7 @@ Orchestrates the full evaluation process from document loading to final decision
 
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Any, Callable, Dict, Optional
 
@@ -15,12 +16,16 @@ from src.agents.input_agent import input_agent
 from src.agents.vectorstore_agent import vectorstore_agent
 from src.agents.summarizer import run_summarizer_extended
 from src.agents.domain_selection import classify_domain
-from src.agents.scoring import run_grant_scoring
+from src.agents.scoring import SCORING_MAX_WORKERS, SCORING_PER_SECTION, early_section_scorer, run_grant_scoring
 from src.config.domain_weights import compute_weighted_score
 from src.agents.critique import run_grant_critique
 from src.agents.budget_agent import run_budget_agent
 from src.agents.decision import run_final_decision_agent
 from src.llm_wrapper import set_deterministic_mode
+from src.prompt_filters import extract_budget_relevant_lines
+from src import semantic_cache
+from pydantic import ValidationError
+from models import EvaluationResult
 
 StatusCallback = Optional[Callable[[Dict[str, Any]], None]]
 
@@ -105,163 +110,16 @@ def build_critique_domain_scores(critique: dict, scores: dict, domain: str) -> l
     return critique_domain_scores
 
 
-def run_full_evaluation(
-    file_path: str,
-    max_budget: float = 50000,
-    override_domain: str = None,
-    check_plagiarism: bool = False,
-    status_callback: StatusCallback = None,
-):
+def evaluate_budget(summary: dict, scores: dict, pages: list, ask: Callable, max_budget, domain: str):
     """
-    Run complete adaptive grant evaluation pipeline.
-
-    Args:
-        file_path: Path to the grant proposal file (PDF/DOCX)
-        max_budget: Maximum allowed requested budget
-        override_domain: Optional domain override by user (bypasses auto-detection)
-    check_plagiarism: Whether to run plagiarism detection
-    status_callback: Optional callable receiving structured stage updates
-
-    Returns:
-        dict: structured evaluation result for frontend
-    """
-    import uuid
-    
-    # Generate unique session ID for this evaluation to track isolation
-    session_id = uuid.uuid4().hex[:12]
-
-    total_stages = len(PIPELINE_STAGES)
-
-    def emit_stage(stage_index: int, status: str, message: Optional[str] = None, progress_override: Optional[int] = None) -> None:
-        if status_callback is None:
-            return
-
-        try:
-            stage_meta = PIPELINE_STAGES[stage_index]
-            stage_key = stage_meta["key"]
-            stage_label = stage_meta["label"]
-        except IndexError:
-            stage_key = f"stage-{stage_index}"
-            stage_label = "Pipeline"
-
-        if progress_override is None:
-            if status == "started":
-                progress_value = max(0, min(99, int((stage_index / total_stages) * 100)))
-            else:
-                progress_value = max(1, min(100, int(((stage_index + 1) / total_stages) * 100)))
-        else:
-            progress_value = max(0, min(100, progress_override))
-
-        payload = {
-            "event": "status",
-            "stage_index": stage_index,
-            "stage_key": stage_key,
-            "label": stage_label,
-            "status": status,
-            "progress": progress_value,
-            "message": message or stage_label,
-            "timestamp": datetime.utcnow().isoformat() + "Z",
-        }
-
-        try:
-            status_callback(payload)
-        except Exception:
-            # Callback errors should not break the evaluation pipeline
-            pass
-
-    # Make evaluation deterministic to remove LLM randomness
-    try:
-        set_deterministic_mode(True)
-    except:
-        pass
-
-    # Step 1 — Extract text pages
-    emit_stage(0, "started", "Extracting proposal pages")
-    print(f"[INFO] Loading document: {file_path}")
-    pages = input_agent(file_path)
-    if not pages:
-        raise ValueError("Document extraction failed.")
-    print(f"[INFO] Loaded {len(pages)} pages")
-    
-    emit_stage(0, "completed", f"Loaded {len(pages)} pages")
-
-    # Step 2 — Build vectorstore fresh each run (avoid cross-proposal contamination)
-    emit_stage(1, "started", "Building semantic index and preparing domain detection")
-    print("[INFO] Creating in-memory vectorstore...")
-    # Get config path relative to the project root
-    config_path = os.path.join(os.path.dirname(__file__), "..", "config.yaml")
-    
-    # Use persist_dir=None to create in-memory vectorstore for complete isolation
-    vs = vectorstore_agent(pages, config_path=config_path, persist_dir=None)
-
-    # Step 3 — Domain classification (or use override) - DO THIS FIRST
-    if override_domain:
-        print(f"[INFO] Using user-specified domain → {override_domain}")
-        domain = override_domain
-        emit_stage(1, "completed", f"Domain locked to {domain}")
-    else:
-        print("[INFO] Detecting academic / research domain...")
-        domain = classify_domain(" ".join([p.page_content for p in pages]))
-        print(f"[INFO] Domain Detected → {domain}")
-        emit_stage(1, "completed", f"Detected domain: {domain}")
-
-    # Step 4 — Structured summarization (section-wise) with domain context
-    emit_stage(2, "started", "Generating structured summary")
-    print("[INFO] Generating structured summary...")
-    summary = run_summarizer_extended(vs["ask"], domain=domain)
-    emit_stage(2, "completed", "Summary generated")
-
-    # Step 5 — Scoring (raw, before weighting)
-    emit_stage(3, "started", "Scoring proposal against rubric")
-    print("[INFO] Running scoring agent...")
-    scores = run_grant_scoring(summary, domain)
-    
-    emit_stage(3, "completed", "Section scores computed")
-
-    # Step 6 — Critique (uses scoring to generate quality assessment)
-    emit_stage(4, "started", "Generating critique and risk analysis")
-    print("[INFO] Generating critique...")
-    critique = run_grant_critique(
-        scorer_json=scores,
-        summaries_json=summary,
-        domain=domain
-    )
-    emit_stage(4, "completed", "Critique ready")
-    
-    # Step 6.5 — Build critique domain scores for comprehensive evaluation
-    print("[INFO] Building critique domain scores...")
-    critique_domain_scores = build_critique_domain_scores(critique, scores, domain)
-    print(f"[INFO] Generated {len(critique_domain_scores)} critique domain scores")
+    Budget analysis (MULTI-STRATEGY EXTRACTION).
     
-    # Step 7 — Compute COMPREHENSIVE final score (section scores + critique scores)
-    print("[INFO] Computing comprehensive final score...")
+    Gathers budget text from the summary, raw pages, vectorstore retrieval and other
+    summary sections, then runs the budget agent on it.
     
-    # Handle case where LLM returns unexpected structure
-    if not isinstance(scores, dict):
-        raise ValueError(f"Scoring agent returned non-dict type: {type(scores)}")
-    
-    if "scores" not in scores:
-        # Try to recover if the LLM returned the section scores directly
-        if any(key in scores for key in ["Objectives", "Methodology", "Budget"]):
-            print("[WARNING] Scoring agent returned flat structure, wrapping it...")
-            scores = {"scores": scores, "overall_summary": ""}
-        else:
-            raise KeyError(f"Scoring agent response missing 'scores' key. Keys found: {list(scores.keys())}")
-    
-    # Check if scores dict is empty (happens when JSON parsing completely failed)
-    if not scores["scores"] or len(scores["scores"]) == 0:
-        raise ValueError("Scoring agent returned empty scores dictionary. Please retry evaluation.")
-    
-    # NEW: Pass critique domains to get comprehensive score
-    final_weighted_score = compute_weighted_score(
-        scores["scores"], 
-        domain, 
-        critique_domains=critique_domain_scores
-    )
-    print(f"[INFO] Final Comprehensive Score = {final_weighted_score:.2f}/10")
-
-    # Step 8 — Budget analysis (MULTI-STRATEGY EXTRACTION)
-    emit_stage(5, "started", "Evaluating budget structure")
+    Returns:
+        (budget_evaluation, stage_message)
+    """
     print("[INFO] Evaluating budget...")
     
     # Strategy 1: Get budget from summarizer output
@@ -285,7 +143,8 @@ def run_full_evaluation(
     
     # If we found budget pages, append to budget_text
     if budget_pages_content:
-        raw_budget_text = "\n\n".join(budget_pages_content)
+        # Keep only the paragraphs of those pages that talk about money
+        raw_budget_text = extract_budget_relevant_lines("\n\n".join(budget_pages_content))
         
         # If summary budget is weak, replace with raw extraction
         if len(budget_text) < 100:
@@ -298,11 +157,11 @@ def run_full_evaluation(
     
     # Strategy 3: Use vectorstore to retrieve budget-specific chunks
     print("[INFO] Strategy 3 - Vectorstore retrieval for budget...")
-    budget_query_results = vs["ask"]("Extract all budget information, costs, expenses, line items, dollar amounts, and financial details")
+    budget_query_results = ask("Extract all budget information, costs, expenses, line items, dollar amounts, and financial details")
     budget_chunks = [doc.get("text", "") for doc in budget_query_results if any(kw in doc.get("text", "").lower() for kw in ["$", "budget", "cost", "expense"])]
     
     if budget_chunks:
-        vector_budget_text = "\n\n".join(budget_chunks[:10])  # Top 10 most relevant
+        vector_budget_text = extract_budget_relevant_lines("\n\n".join(budget_chunks[:10]))  # Top 10 most relevant
         
         # Add to budget text if substantial
         if len(vector_budget_text) > 100:
@@ -415,62 +274,268 @@ def run_full_evaluation(
 
         budget_stage_message = f"Budget analysis complete (total ${budget_evaluation['totalBudget']:.2f})"
 
-    emit_stage(5, "completed", budget_stage_message)
+    return budget_evaluation, budget_stage_message
+
+
+def run_full_evaluation(
+    file_path: str,
+    max_budget: float = 50000,
+    override_domain: str = None,
+    check_plagiarism: bool = False,
+    status_callback: StatusCallback = None,
+):
+    """
+    Run complete adaptive grant evaluation pipeline.
+
+    Args:
+        file_path: Path to the grant proposal file (PDF/DOCX)
+        max_budget: Maximum allowed requested budget
+        override_domain: Optional domain override by user (bypasses auto-detection)
+    check_plagiarism: Whether to run plagiarism detection
+    status_callback: Optional callable receiving structured stage updates
+
+    Returns:
+        dict: structured evaluation result for frontend
+    """
+    import uuid
+    
+    # Generate unique session ID for this evaluation to track isolation
+    session_id = uuid.uuid4().hex[:12]
+
+    total_stages = len(PIPELINE_STAGES)
+
+    def emit_stage(stage_index: int, status: str, message: Optional[str] = None, progress_override: Optional[int] = None) -> None:
+        if status_callback is None:
+            return
 
-    # Step 9 — Compliance and optional plagiarism check
-    emit_stage(6, "started", "Running compliance checks")
-    plagiarism_result = None
-    compliance_message = "Compliance checks completed"
-    if check_plagiarism:
-        print("[INFO] Running plagiarism detection...")
         try:
-            from src.plagiarism.plagiarism_detector import detect_plagiarism
-            full_text = " ".join([p.page_content for p in pages])
-            plagiarism_result = detect_plagiarism(full_text)
-            risk_level = plagiarism_result.get("risk_level", "UNKNOWN")
-            print(f"[INFO] Plagiarism Risk Level → {risk_level}")
-            compliance_message = f"Plagiarism check completed (risk {risk_level})"
-        except Exception as e:
-            print(f"[WARNING] Plagiarism check failed: {str(e)}")
-            plagiarism_result = {
-                "error": str(e),
-                "risk_level": "UNKNOWN"
-            }
-            compliance_message = "Plagiarism check encountered an error"
-    else:
-        compliance_message = "Plagiarism scan skipped (disabled)"
-
-    emit_stage(6, "completed", compliance_message)
-
-    # Step 10 — Final decision (uses weighted score, does NOT recalc score)
-    emit_stage(7, "started", "Compiling final recommendation package")
-    print("[INFO] Finalizing decision...")
-    final_decision = run_final_decision_agent(
-        summary_json=summary,
-        scores_json=scores,
-        critique_json=critique,
-        budget_json=budget_evaluation,
-        final_weighted_score=final_weighted_score,
-        domain=domain
-    )
+            stage_meta = PIPELINE_STAGES[stage_index]
+            stage_key = stage_meta["key"]
+            stage_label = stage_meta["label"]
+        except IndexError:
+            stage_key = f"stage-{stage_index}"
+            stage_label = "Pipeline"
 
-    response = format_evaluation_response(
-        summary, scores, critique, budget_evaluation, final_decision,
-        final_weighted_score, domain, critique_domain_scores, plagiarism_result
-    )
+        if progress_override is None:
+            if status == "started":
+                progress_value = max(0, min(99, int((stage_index / total_stages) * 100)))
+            else:
+                progress_value = max(1, min(100, int(((stage_index + 1) / total_stages) * 100)))
+        else:
+            progress_value = max(0, min(100, progress_override))
 
-    emit_stage(7, "completed", f"Recommendation ready ({response.get('decision', 'UNKNOWN')})")
+        payload = {
+            "event": "status",
+            "stage_index": stage_index,
+            "stage_key": stage_key,
+            "label": stage_label,
+            "status": status,
+            "progress": progress_value,
+            "message": message or stage_label,
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+        }
+
+        try:
+            status_callback(payload)
+        except Exception:
+            # Callback errors should not break the evaluation pipeline
+            pass
+
+    # Make evaluation deterministic to remove LLM randomness
+    try:
+        set_deterministic_mode(True)
+    except:
+        pass
+
+    # Step 1 — Extract text pages
+    emit_stage(0, "started", "Extracting proposal pages")
+    print(f"[INFO] Loading document: {file_path}")
+    pages = input_agent(file_path)
+    if not pages:
+        raise ValueError("Document extraction failed.")
+    print(f"[INFO] Loaded {len(pages)} pages")
+    
+    emit_stage(0, "completed", f"Loaded {len(pages)} pages")
+
+    # Reuse the evaluation of identical, previously evaluated content (SEMANTIC_CACHE=1)
+    semantic_key = None
+    if semantic_cache.SEMANTIC_CACHE_ENABLED:
+        doc_hash = semantic_cache.content_hash([p.page_content for p in pages])
+        scope = semantic_cache.scope_key(max_budget=max_budget, domain=override_domain, plagiarism=check_plagiarism)
+        cached_response = semantic_cache.lookup(doc_hash, scope)
+        if cached_response is not None:
+            try:
+                EvaluationResult.model_validate(cached_response)
+            except ValidationError as e:
+                print(f"[WARNING] Cached evaluation no longer matches the response model; re-evaluating: {e}")
+            else:
+                emit_stage(7, "completed", "Reused evaluation of identical content", progress_override=100)
+                return cached_response
+        semantic_key = (doc_hash, scope)
+
+    # Step 2 — Build vectorstore per document (avoid cross-proposal contamination;
+    # an identical document reuses its pooled in-memory vectorstore)
+    emit_stage(1, "started", "Building semantic index and preparing domain detection")
+    print("[INFO] Creating in-memory vectorstore...")
+    # Get config path relative to the project root
+    config_path = os.path.join(os.path.dirname(__file__), "..", "config.yaml")
+    
+    # Use persist_dir=None to create in-memory vectorstore for complete isolation
+    vs = vectorstore_agent(pages, config_path=config_path, persist_dir=None)
+    # The budget job may still query the vectorstore if a later step fails; see release below
+    budget_future = None
+    try:
+        # Step 3 — Domain classification (or use override) - DO THIS FIRST
+        if override_domain:
+            print(f"[INFO] Using user-specified domain → {override_domain}")
+            domain = override_domain
+            emit_stage(1, "completed", f"Domain locked to {domain}")
+        else:
+            print("[INFO] Detecting academic / research domain...")
+            domain = classify_domain(" ".join([p.page_content for p in pages]))
+            print(f"[INFO] Domain Detected → {domain}")
+            emit_stage(1, "completed", f"Detected domain: {domain}")
+
+        # Step 4 — Structured summarization (section-wise) with domain context
+        emit_stage(2, "started", "Generating structured summary")
+        print("[INFO] Generating structured summary...")
+        # With per-section scoring, sections are scored as the streamed summary completes them
+        early_scores = None
+        if SCORING_PER_SECTION:
+            early_pool = ThreadPoolExecutor(max_workers=SCORING_MAX_WORKERS)
+            on_section, early_scores = early_section_scorer(domain, early_pool)
+            summary = run_summarizer_extended(vs["ask"], domain=domain, on_section=on_section)
+            early_pool.shutdown(wait=False)  # run_grant_scoring waits for the scores it reuses
+        else:
+            summary = run_summarizer_extended(vs["ask"], domain=domain)
+        emit_stage(2, "completed", "Summary generated")
+
+        # Step 5 — Scoring (raw, before weighting)
+        emit_stage(3, "started", "Scoring proposal against rubric")
+        print("[INFO] Running scoring agent...")
+        scores = run_grant_scoring(summary, domain, early_scores=early_scores)
+    
+        emit_stage(3, "completed", "Section scores computed")
+
+        # Handle case where LLM returns unexpected structure
+        if not isinstance(scores, dict):
+            raise ValueError(f"Scoring agent returned non-dict type: {type(scores)}")
+    
+        if "scores" not in scores:
+            # Try to recover if the LLM returned the section scores directly
+            if any(key in scores for key in ["Objectives", "Methodology", "Budget"]):
+                print("[WARNING] Scoring agent returned flat structure, wrapping it...")
+                scores = {"scores": scores, "overall_summary": ""}
+            else:
+                raise KeyError(f"Scoring agent response missing 'scores' key. Keys found: {list(scores.keys())}")
+    
+        # Check if scores dict is empty (happens when JSON parsing completely failed)
+        if not scores["scores"] or len(scores["scores"]) == 0:
+            raise ValueError("Scoring agent returned empty scores dictionary. Please retry evaluation.")
+
+        # Budget analysis only needs the summary and section scores, so its LLM call runs
+        # concurrently with the critique below instead of after it
+        budget_pool = ThreadPoolExecutor(max_workers=1)
+        budget_future = budget_pool.submit(
+            evaluate_budget, summary, scores, pages, vs["ask"], max_budget, domain
+        )
+        budget_pool.shutdown(wait=False)  # the submitted job still runs to completion
+
+        # Step 6 — Critique (uses scoring to generate quality assessment)
+        emit_stage(4, "started", "Generating critique and risk analysis")
+        print("[INFO] Generating critique...")
+        critique = run_grant_critique(
+            scorer_json=scores,
+            summaries_json=summary,
+            domain=domain
+        )
+        emit_stage(4, "completed", "Critique ready")
+    
+        # Step 6.5 — Build critique domain scores for comprehensive evaluation
+        print("[INFO] Building critique domain scores...")
+        critique_domain_scores = build_critique_domain_scores(critique, scores, domain)
+        print(f"[INFO] Generated {len(critique_domain_scores)} critique domain scores")
+    
+        # Step 7 — Compute COMPREHENSIVE final score (section scores + critique scores)
+        print("[INFO] Computing comprehensive final score...")
+    
+        # NEW: Pass critique domains to get comprehensive score
+        final_weighted_score = compute_weighted_score(
+            scores["scores"], 
+            domain, 
+            critique_domains=critique_domain_scores
+        )
+        print(f"[INFO] Final Comprehensive Score = {final_weighted_score:.2f}/10")
+
+        # Step 8 — Budget analysis (started right after scoring, runs alongside the critique)
+        emit_stage(5, "started", "Evaluating budget structure")
+        budget_evaluation, budget_stage_message = budget_future.result()
+        emit_stage(5, "completed", budget_stage_message)
+
+        # Step 9 — Compliance and optional plagiarism check
+        emit_stage(6, "started", "Running compliance checks")
+        plagiarism_result = None
+        compliance_message = "Compliance checks completed"
+        if check_plagiarism:
+            print("[INFO] Running plagiarism detection...")
+            try:
+                from src.plagiarism.plagiarism_detector import detect_plagiarism
+                full_text = " ".join([p.page_content for p in pages])
+                plagiarism_result = detect_plagiarism(full_text)
+                risk_level = plagiarism_result.get("risk_level", "UNKNOWN")
+                print(f"[INFO] Plagiarism Risk Level → {risk_level}")
+                compliance_message = f"Plagiarism check completed (risk {risk_level})"
+            except Exception as e:
+                print(f"[WARNING] Plagiarism check failed: {str(e)}")
+                plagiarism_result = {
+                    "error": str(e),
+                    "risk_level": "UNKNOWN"
+                }
+                compliance_message = "Plagiarism check encountered an error"
+        else:
+            compliance_message = "Plagiarism scan skipped (disabled)"
+
+        emit_stage(6, "completed", compliance_message)
+
+        # Step 10 — Final decision (uses weighted score, does NOT recalc score)
+        emit_stage(7, "started", "Compiling final recommendation package")
+        print("[INFO] Finalizing decision...")
+        final_decision = run_final_decision_agent(
+            summary_json=summary,
+            scores_json=scores,
+            critique_json=critique,
+            budget_json=budget_evaluation,
+            final_weighted_score=final_weighted_score,
+            domain=domain
+        )
+
+        response = format_evaluation_response(
+            summary, scores, critique, budget_evaluation, final_decision,
+            final_weighted_score, domain, critique_domain_scores, plagiarism_result
+        )
+
+        emit_stage(7, "completed", f"Recommendation ready ({response.get('decision', 'UNKNOWN')})")
+
+        if semantic_key is not None:
+            semantic_cache.store(*semantic_key, response)
+    finally:
+        # Return the pool lease once nothing queries the store any more, so an evicted
+        # collection is dropped only after this evaluation (see vectorstore_agent)
+        if budget_future is not None:
+            budget_future.add_done_callback(lambda _future: vs["release"]())
+        else:
+            vs["release"]()
 
-    # Cleanup: Explicitly delete vectorstore and free memory
+    # Cleanup. The vectorstore stays pooled for re-evaluations of the same document
     try:
-        if vs and "vectorstore" in vs:
-            del vs["vectorstore"]
-            del vs
         # Clean up embeddings cache to free memory
         from src.embeddings import cleanup_embeddings
         cleanup_embeddings()
-        import gc
-        gc.collect()
+        # A full collection walks the whole heap (tens to hundreds of ms) and reclaims
+        # little that refcounting has not already freed; only force it where memory is tight
+        if os.getenv("EVAL_FORCE_GC", "0") == "1":
+            import gc
+            gc.collect()
     except Exception as e:
         print(f"[WARNING] Cleanup error: {e}")
 
@@ -13,6 +13,7 @@ from contextlib import asynccontextmanager
 import os
 import sys
 import tempfile
+import threading
 from datetime import datetime, timezone
 from bson import ObjectId
 
@@ -42,6 +43,12 @@ async def lifespan(app: FastAPI):
         print(f"\n💡 Solution: Check QUICKFIX_MONGODB.md for instructions")
         print(f"{'='*60}\n")
     
+    # Optionally load faiss + the plagiarism model in the background so the first
+    # plagiarism check does not pay the import/load latency (costs the model's memory)
+    if os.getenv("PLAGIARISM_PREWARM", "0") == "1":
+        from src.plagiarism.model_cache import prewarm
+        threading.Thread(target=prewarm, daemon=True).start()
+    
     yield
     
     # Shutdown
@@ -116,6 +123,7 @@ async def health_check():
     """Detailed health check to verify backend is responsive"""
     import psutil
     import os
+    from src.llm_wrapper import cache_stats
     
     process = psutil.Process(os.getpid())
     memory_info = process.memory_info()
@@ -126,6 +134,7 @@ async def health_check():
         "memory_mb": round(memory_info.rss / 1024 / 1024, 2),
         "memory_percent": round(process.memory_percent(), 2),
         "cpu_percent": round(process.cpu_percent(interval=0.1), 2),
+        "llm_cache": cache_stats(),
         "message": "Backend is alive and responding"
     }
 
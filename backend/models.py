@@ -69,9 +69,8 @@ class PlagiarismCheck(BaseModel):
     error: Optional[str] = None
 
 
-class EvaluationCreate(BaseModel):
-    file_name: str
-    file_size: int
+class EvaluationResult(BaseModel):
+    """What run_full_evaluation returns (before the upload's file details are added)."""
     decision: Literal["ACCEPT", "REJECT", "REVISE", "CONDITIONALLY ACCEPT"]
     overall_score: float
     domain: str
@@ -84,6 +83,11 @@ class EvaluationCreate(BaseModel):
     plagiarism_check: Optional[PlagiarismCheck] = None
 
 
+class EvaluationCreate(EvaluationResult):
+    file_name: str
+    file_size: int
+
+
 class EvaluationResponse(EvaluationCreate):
     id: str
     created_at: str
@@ -1,14 +1,8 @@
-import json
-import re
-from src.llm_wrapper import gemini_llm  # your LLM wrapper
-from src.prompts import BUDGET_PROMPT  # your prompt template
-
-
-def strip_codeblock(text: str) -> str:
-    """
-    Remove Markdown-style code block wrappers (```json ... ```) if present.
-    """
-    return re.sub(r"^```(?:json)?\n|```$", "", text.strip(), flags=re.MULTILINE)
+import orjson
+from src.llm_wrapper import structured_llm  # your LLM wrapper
+from src.prompts import prompt_parts  # your prompt template
+from src.agents.json_utils import strip_codeblock
+from src.schemas import BudgetAnalysis
 
 
 def run_budget_agent(budget_input, max_budget=None, domain="General"):
@@ -25,24 +19,29 @@ def run_budget_agent(budget_input, max_budget=None, domain="General"):
         dict: LLM output with budget_score, budget_summary, flags, recommendations
     """
     # Convert input to JSON string
-    budget_json_str = json.dumps(budget_input, indent=2)
+    budget_json_str = orjson.dumps(budget_input, option=orjson.OPT_INDENT_2).decode()
 
-    # Prepare prompt with domain context
-    prompt = BUDGET_PROMPT.format(
+    # Only the per-call tail (domain, limit, budget data) is formatted; the static prefix is sent as-is
+    prompt = prompt_parts(
+        "budget",
         budget_json=budget_json_str, 
         max_budget=max_budget or "N/A",
         domain=domain
     )
 
     # Call LLM with higher token limit for detailed extraction
-    response = gemini_llm(prompt, max_output_tokens=8192)
+    budget_result, response = structured_llm(
+        prompt, BudgetAnalysis, max_output_tokens=8192
+    )
+    if budget_result is not None:
+        return budget_result
 
     cleaned_response = strip_codeblock(response)
 
     # Parse JSON safely
     try:
-        budget_result = json.loads(cleaned_response)
-    except json.JSONDecodeError as e:
+        budget_result = orjson.loads(cleaned_response)
+    except orjson.JSONDecodeError as e:
         print(f"[ERROR] Budget agent JSON parse error: {e}")
         budget_result = {"raw_response": cleaned_response, "totalBudget": 0.0, "breakdown": [], "flags": []}
 
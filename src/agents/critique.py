@@ -1,14 +1,9 @@
-from src.llm_wrapper import gemini_llm
-import json
-import re
-from src.prompts import MASTER_CRITIQUE_PROMPT
-
-
-def strip_codeblock(text: str) -> str:
-    """
-    Remove Markdown-style code block wrappers (```json ... ```) if present.
-    """
-    return re.sub(r"^```(?:json)?\n|```$", "", text.strip(), flags=re.MULTILINE)
+from src.llm_wrapper import structured_llm
+import orjson
+from src.prompts import prompt_parts
+from src.agents.json_utils import strip_codeblock
+from src.schemas import CritiqueOutput
+from src.prompt_filters import section_texts
 
 
 def run_grant_critique(scorer_json, summaries_json=None, domain="General"):
@@ -40,28 +35,31 @@ def run_grant_critique(scorer_json, summaries_json=None, domain="General"):
         A structured critique JSON with identified issues, recommendations, and top priorities.
     """
 
-    # Combine inputs into a single structured payload
+    # Combine inputs into a single structured payload; of the summary only the section
+    # texts are passed on, the scorer output already carries the per-section verdicts
     combined_input = {
-        "summaries": summaries_json if summaries_json else {},
+        "summaries": section_texts(summaries_json) if summaries_json else {},
         "scorer_output": scorer_json,
     }
 
     # Convert to string for prompt formatting
-    input_json_str = json.dumps(combined_input, indent=2)
+    input_json_str = orjson.dumps(combined_input, option=orjson.OPT_INDENT_2).decode()
 
-    # Prepare the full prompt with domain context
-    prompt = MASTER_CRITIQUE_PROMPT.format(input_json=input_json_str, domain=domain)
+    # Only the per-call tail (domain + input) is formatted; the static prefix is sent as-is
+    prompt = prompt_parts("critique", input_json=input_json_str, domain=domain)
 
     # Call Gemini LLM
-    response = gemini_llm(prompt)
+    critique_json, response = structured_llm(prompt, CritiqueOutput)
+    if critique_json is not None:
+        return critique_json
 
     # Clean Markdown wrappers
     cleaned_response = strip_codeblock(response)
 
     # Parse safely to JSON
     try:
-        critique_json = json.loads(cleaned_response)
-    except json.JSONDecodeError:
+        critique_json = orjson.loads(cleaned_response)
+    except orjson.JSONDecodeError:
         critique_json = {"error": "Invalid JSON output", "raw_response": cleaned_response}
 
     return critique_json
@@ -1,15 +1,19 @@
-from src.llm_wrapper import gemini_llm
-import json
-import re
-from src.prompts import FINAL_DECISION_PROMPT
+from src.llm_wrapper import structured_llm
+import orjson
+from src.prompts import prompt_parts
+from src.agents.json_utils import strip_codeblock
+from src.schemas import DecisionNarrative
+from src.prompt_filters import summarize_for_decision
+from src.config.decision_thresholds import decide
 
-def strip_codeblock(text: str) -> str:
-    return re.sub(r"^```(?:json)?\n|```$", "", text.strip(), flags=re.MULTILINE)
 
 def run_final_decision_agent(scores_json, critique_json, budget_json, summary_json, final_weighted_score=None, domain="General"):
     """
     Combines outputs from scoring, critique, and budget agents with summary for final decision.
-    
+
+    The decision follows from `final_weighted_score` via `decide`; the LLM only writes the
+    rationale, key strengths/weaknesses and next steps. Without a score no decision is set.
+
     Args:
         scores_json: Scoring results
         critique_json: Critique analysis
@@ -18,26 +22,32 @@ def run_final_decision_agent(scores_json, critique_json, budget_json, summary_js
         final_weighted_score: Pre-calculated weighted score (optional)
         domain: The academic/research domain for context (default: "General")
     """
-    full_input = {
-        "scores": scores_json,
-        "critique": critique_json,
-        "budget": budget_json,
-        "summary": summary_json,
-        "final_weighted_score": final_weighted_score
-    }
-
-    prompt = FINAL_DECISION_PROMPT.format(
-        data=json.dumps(full_input, indent=2),
+    verdict = {}
+    if final_weighted_score is not None:
+        verdict = {"final_score": final_weighted_score, "decision": decide(final_weighted_score)}
+
+    # Only the parts of each agent's output the decision needs (see prompt_filters)
+    full_input = summarize_for_decision(scores_json, critique_json, budget_json, summary_json)
+
+    # Only the per-call tail is formatted; the static prefix is sent as-is
+    prompt = prompt_parts(
+        "final_decision",
+        data=orjson.dumps(full_input, option=orjson.OPT_INDENT_2).decode(),
         domain=domain,
+        decision=verdict.get("decision", "Not determined"),
         final_weighted_score=final_weighted_score if final_weighted_score is not None else "N/A"
     )
 
-    response = gemini_llm(prompt)
+    narrative, response = structured_llm(prompt, DecisionNarrative)
+    if narrative is not None:
+        return {**verdict, **narrative}
     cleaned = strip_codeblock(response)
 
     try:
-        decision_json = json.loads(cleaned)
-    except json.JSONDecodeError:
-        decision_json = {"raw_response": cleaned}
+        narrative = orjson.loads(cleaned)
+    except orjson.JSONDecodeError:
+        narrative = {"raw_response": cleaned}
 
-    return decision_json
+    if not isinstance(narrative, dict):
+        narrative = {"raw_response": cleaned}
+    return {**narrative, **verdict}
@@ -1,9 +1,28 @@
 # src/agents/domain_classifier.py
 
-from src.llm_wrapper import gemini_llm
-from src.prompts import DOMAIN_CLASSIFIER_PROMPT
+import os
+import threading
+import numpy as np
+from src.llm_wrapper import cached_llm
+from src.prompts import prompt_parts
+from src.config.domain_rubrics import domain_rubric
+from src.config.domains import DEFAULT_DOMAIN, DOMAINS
+from src.schemas import ClassifierDomain
 import re
 
+# DOMAIN_CLASSIFIER=local labels proposals by embedding similarity to the domain descriptions
+# (no LLM call), falling back to the LLM when the best match is below
+# DOMAIN_CLASSIFIER_MIN_SIMILARITY. Default "llm" always asks the LLM.
+DOMAIN_CLASSIFIER = os.getenv("DOMAIN_CLASSIFIER", "llm").lower()
+DOMAIN_CLASSIFIER_MIN_SIMILARITY = float(os.getenv("DOMAIN_CLASSIFIER_MIN_SIMILARITY", "0.35"))
+# Leading text embedded for local classification, as up to this many pieces
+LOCAL_CLASSIFIER_CHARS = 4000
+LOCAL_CLASSIFIER_PIECES = 4
+
+# Label embeddings per embedding model variant, computed on first use
+_label_embeddings: dict[str, tuple[list[str], np.ndarray]] = {}
+_label_embeddings_lock = threading.Lock()
+
 def strip_response(text: str) -> str:
     """
     Clean LLM output to extract a simple string domain label.
@@ -17,6 +36,11 @@ def classify_domain(proposal_text: str) -> str:
     Classify proposal into a domain using the LLM.
     Truncates input to avoid API errors with large documents.
     """
+    if DOMAIN_CLASSIFIER == "local":
+        domain = classify_domain_local(proposal_text)
+        if domain is not None:
+            return domain
+
     # Limit to first 5000 characters (usually enough for classification)
     # This avoids 500 errors from sending too much data
     max_chars = 5000
@@ -25,72 +49,73 @@ def classify_domain(proposal_text: str) -> str:
     if len(proposal_text) > max_chars:
         truncated_text += "\n\n[... content truncated for classification ...]"
     
-    prompt = DOMAIN_CLASSIFIER_PROMPT.format(context=truncated_text)
+    # Proposal text goes in its own part after the static label list and rules
+    prompt = prompt_parts("domain_classifier", context=truncated_text)
     
+    # The label only depends on the (truncated) text, so repeat runs are served from cache.
+    # The enum schema restricts decoding to the listed labels, so no free text is generated
     try:
-        response = gemini_llm(prompt)
+        response = cached_llm(prompt, response_schema=ClassifierDomain)
     except Exception as e:
         print(f"[WARNING] Domain classification failed: {e}")
-        print("[INFO] Defaulting to 'Social Sciences / Policy'")
-        return "Social Sciences / Policy"
+        print(f"[INFO] Defaulting to '{DEFAULT_DOMAIN}'")
+        return DEFAULT_DOMAIN
 
     domain = strip_response(response)
 
     # Optional: safety fallback if model outputs garbage
-    allowed_domains = [
-        "AI / Computer Science",
-        "Biotechnology / Life Sciences",
-        "Healthcare / Medicine",
-        "Education / Learning Sciences",
-        "Environment / Climate / Sustainability",
-        "Social Sciences / Policy",
-        "Engineering / Technology",
-        "Physics / Materials Science",
-        "Chemistry / Chemical Engineering",
-        "Agriculture / Food Science",
-        "Energy / Renewable Resources",
-        "Economics / Business",
-        "Arts / Humanities",
-        "Psychology / Behavioral Sciences",
-        "Urban Planning / Architecture",
-        "Data Science / Statistics",
-        "Cybersecurity / Information Security",
-        "Public Health / Epidemiology",
-        "Space Science / Astronomy",
-        "Marine Biology / Oceanography",
-        "Neuroscience / Cognitive Science"
-    ]
-
-    if domain not in allowed_domains:
-        domain = "Social Sciences / Policy"  # default safest domain
+    if domain not in DOMAINS:
+        domain = DEFAULT_DOMAIN  # default safest domain
 
     return domain
 
 
+def classify_domain_local(proposal_text: str) -> str | None:
+    """
+    Zero-shot domain label from embedding similarity, or None if no label is similar enough
+    (or the embedding model is unavailable).
+    """
+    from src.plagiarism.model_cache import get_st_model, model_variant
+
+    head = proposal_text[:LOCAL_CLASSIFIER_CHARS]
+    step = max(1, -(-len(head) // LOCAL_CLASSIFIER_PIECES))
+    pieces = [head[i:i + step] for i in range(0, len(head), step) if head[i:i + step].strip()]
+    if not pieces:
+        return None
+    try:
+        model = get_st_model()
+        labels, label_embs = _domain_label_embeddings(model, model_variant(model))
+        doc_emb = np.asarray(model.encode(pieces, normalize_embeddings=True, show_progress_bar=False),
+                             dtype=np.float32).mean(axis=0)
+    except Exception as e:
+        print(f"[WARNING] Local domain classification failed: {e}")
+        return None
+
+    doc_emb /= np.linalg.norm(doc_emb) or 1.0
+    sims = label_embs @ doc_emb
+    best = int(np.argmax(sims))
+    if sims[best] < DOMAIN_CLASSIFIER_MIN_SIMILARITY:
+        print(f"[INFO] Local domain match too weak ({sims[best]:.2f}); asking the LLM")
+        return None
+    print(f"[INFO] Local domain match: {labels[best]} ({sims[best]:.2f})")
+    return labels[best]
+
+
+def _domain_label_embeddings(model, variant: str) -> tuple[list[str], np.ndarray]:
+    """Embed each domain with its review description once per embedding model."""
+    with _label_embeddings_lock:
+        cached = _label_embeddings.get(variant)
+        if cached is None:
+            labels = list(DOMAINS)
+            descriptions = [f"{label}. {domain_rubric(label)}" for label in labels]
+            embs = np.asarray(model.encode(descriptions, normalize_embeddings=True, show_progress_bar=False),
+                              dtype=np.float32)
+            cached = _label_embeddings[variant] = (labels, embs)
+    return cached
+
+
 def get_all_domains() -> list:
     """
     Return list of all available domains for UI dropdown.
     """
-    return [
-        "AI / Computer Science",
-        "Biotechnology / Life Sciences",
-        "Healthcare / Medicine",
-        "Education / Learning Sciences",
-        "Environment / Climate / Sustainability",
-        "Social Sciences / Policy",
-        "Engineering / Technology",
-        "Physics / Materials Science",
-        "Chemistry / Chemical Engineering",
-        "Agriculture / Food Science",
-        "Energy / Renewable Resources",
-        "Economics / Business",
-        "Arts / Humanities",
-        "Psychology / Behavioral Sciences",
-        "Urban Planning / Architecture",
-        "Data Science / Statistics",
-        "Cybersecurity / Information Security",
-        "Public Health / Epidemiology",
-        "Space Science / Astronomy",
-        "Marine Biology / Oceanography",
-        "Neuroscience / Cognitive Science"
-    ]
+    return list(DOMAINS)
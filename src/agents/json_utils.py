@@ -0,0 +1,85 @@
+import json
+import re
+
+# Markdown code fence wrappers (```json ... ```) around LLM JSON output
+_CODEBLOCK_RE = re.compile(r"^```(?:json)?\n|```$", re.MULTILINE)
+
+_DECODER = json.JSONDecoder()
+
+
+def strip_codeblock(text: str) -> str:
+    """
+    Remove Markdown-style code block wrappers (```json ... ```) if present.
+    """
+    return _CODEBLOCK_RE.sub("", text.strip())
+
+
+def try_parse_json(text: str) -> tuple[bool, object]:
+    """
+    Parse the JSON object or array at the start of `text`, ignoring anything after it.
+
+    Returns (True, value) on success and (False, None) otherwise, so callers can branch
+    on the result instead of wrapping their whole success path in try/except.
+    """
+    text = text.lstrip()
+    if not text or text[0] not in "{[":
+        return False, None
+    try:
+        value, _ = _DECODER.raw_decode(text)
+    except json.JSONDecodeError:
+        return False, None
+    return True, value
+
+
+class ObjectMemberStream:
+    """
+    Pull the top-level members out of a JSON object while it is still being streamed.
+
+    `feed` takes the next chunk of text and returns the (key, value) pairs completed by it.
+    A member counts as complete once the text after its value has started (`,` or `}`), so
+    a number or string cut off mid-stream is never returned early. Anything before the
+    opening brace (e.g. a code fence) is skipped. Malformed input simply yields nothing
+    more; the caller still parses the full response at the end.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget everything fed so far (the stream is starting over)."""
+        self._text = ""
+        self._pos = None  # index after "{" or after the last complete member
+
+    def feed(self, chunk: str) -> list[tuple[str, object]]:
+        self._text += chunk
+        if self._pos is None:
+            start = self._text.find("{")
+            if start < 0:
+                return []
+            self._pos = start + 1
+
+        members = []
+        text = self._text
+        while True:
+            pos = _skip(text, self._pos, " \t\r\n,")
+            if pos >= len(text) or text[pos] != '"':
+                return members
+            try:
+                key, pos = _DECODER.raw_decode(text, pos)
+                pos = _skip(text, pos, " \t\r\n")
+                if text[pos:pos + 1] != ":":
+                    return members
+                value, pos = _DECODER.raw_decode(text, _skip(text, pos + 1, " \t\r\n"))
+            except (json.JSONDecodeError, IndexError):
+                return members
+            end = _skip(text, pos, " \t\r\n")
+            if end >= len(text) or text[end] not in ",}":
+                return members
+            members.append((key, value))
+            self._pos = end
+
+
+def _skip(text: str, pos: int, chars: str) -> int:
+    while pos < len(text) and text[pos] in chars:
+        pos += 1
+    return pos
@@ -4,32 +4,38 @@ from reportlab.lib import colors
 from reportlab.lib.units import cm
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, KeepTogether
-from reportlab.graphics.shapes import Drawing, Rect
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY, TA_RIGHT
 from io import BytesIO
 from datetime import datetime
+from functools import lru_cache
+from xml.sax.saxutils import escape
 import re
 
 
-def generate_evaluation_report_pdf(evaluation_data: dict) -> BytesIO:
+def _plain(value) -> str:
+    """Escape user/LLM-provided text so ReportLab's paragraph parser treats it as plain text."""
+    return escape(str(value))
+
+
+def _format_evaluation_date(created_at) -> str:
+    """Format an ISO timestamp as 'YYYY-MM-DD HH:MM:SS'."""
+    # Fast path: stored timestamps are already ISO strings, so just slice them
+    if isinstance(created_at, str) and len(created_at) >= 19 and created_at[10] == 'T':
+        return created_at[:10] + ' ' + created_at[11:19]
+    return datetime.fromisoformat(created_at or datetime.now().isoformat()).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _footer_timestamp() -> str:
+    """Current time formatted for the report footer."""
+    return datetime.now().strftime('%Y-%m-%d at %H:%M:%S')
+
+
+@lru_cache(maxsize=1)
+def _report_styles() -> dict:
     """
-    Generate a comprehensive PDF report for grant evaluation
-    Returns a BytesIO buffer containing the PDF
+    Build the paragraph styles used by the report.
+    Styles are never mutated during layout, so one set is shared by every report.
     """
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=2*cm,
-        leftMargin=2*cm,
-        topMargin=2*cm,
-        bottomMargin=2*cm
-    )
-    
-    # Container for the 'Flowable' objects
-    elements = []
-    
-    # Define styles
     styles = getSampleStyleSheet()
     title_style = ParagraphStyle(
         'CustomTitle',
@@ -77,6 +83,132 @@ def generate_evaluation_report_pdf(evaluation_data: dict) -> BytesIO:
         leading=11
     )
     
+    return {
+        'title': title_style,
+        'heading': heading_style,
+        'subheading': subheading_style,
+        'normal': normal_style,
+        'small': small_style,
+        'domain': ParagraphStyle('DomainStyle', parent=normal_style, alignment=TA_CENTER, textColor=colors.HexColor('#6366f1')),
+        'decision': ParagraphStyle(
+            'DecisionStyle',
+            parent=styles['Normal'],
+            fontSize=18,
+            textColor=colors.white,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        ),
+        'risk': ParagraphStyle(
+            'RiskStyle',
+            parent=styles['Normal'],
+            fontSize=14,
+            textColor=colors.white,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        ),
+        'error': ParagraphStyle('ErrorStyle', parent=normal_style, textColor=colors.HexColor('#ef4444')),
+        'footer': ParagraphStyle('FooterStyle', parent=small_style, alignment=TA_CENTER, textColor=colors.HexColor('#9ca3af')),
+    }
+
+
+# Section-title formatting ("ExpectedOutcomes" -> "Expected Outcomes")
+_CAMEL_CASE_BOUNDARY = re.compile(r'([a-z])([A-Z])')
+_TITLE_STOPWORDS = frozenset({'and', 'of', 'the'})
+
+# Placeholder text for empty fields. Kept as markup strings rather than shared
+# Paragraph instances: Platypus flowables are mutated during layout.
+_NOT_PROVIDED = 'Not provided'
+_NO_STRENGTHS_MARKUP = "• No standout strengths recorded."
+_NO_WEAKNESSES_MARKUP = "• No critical weaknesses identified."
+
+
+def _is_empty_section(section_content: dict) -> bool:
+    """True when a summary section has nothing to render beyond its heading."""
+    text = section_content.get('text')
+    if text and text != _NOT_PROVIDED:
+        return False
+    return not (section_content.get('pages') or section_content.get('references') or section_content.get('notes'))
+
+
+# ============================================================
+# NARRATIVE SUMMARY FIELD RENDERERS
+# Each handler appends flowables for one field of a summary section
+# and returns early when the field is empty.
+# ============================================================
+
+def _render_text(box, value, normal_style, small_style):
+    if not value or value == _NOT_PROVIDED:
+        return
+    box.append(Paragraph(_plain(value), normal_style))
+    box.append(Spacer(1, 0.3*cm))
+
+
+def _render_pages(box, value, normal_style, small_style):
+    if not value:
+        return
+    box.append(Paragraph(f"<b>Pages:</b> {', '.join(_plain(p) for p in value)}", small_style))
+    box.append(Spacer(1, 0.2*cm))
+
+
+def _render_references(box, value, normal_style, small_style):
+    if not value or type(value) is not list:
+        return
+    box.append(Paragraph("<b>Key References:</b>", small_style))
+    for ref in value[:5]:  # Limit to first 5 references
+        box.append(Paragraph(f"• {_plain(ref)}", small_style))
+    if len(value) > 5:
+        box.append(Paragraph(f"<i>... and {len(value) - 5} more</i>", small_style))
+    box.append(Spacer(1, 0.2*cm))
+
+
+def _render_notes(box, value, normal_style, small_style):
+    if not value:
+        return
+    if type(value) is list:
+        box.append(Paragraph("<b>Notes:</b>", small_style))
+        for note in value:
+            box.append(Paragraph(f"• {_plain(note)}", small_style))
+    elif isinstance(value, str):
+        box.append(Paragraph(f"<b>Notes:</b> {_plain(value)}", small_style))
+
+
+_NARRATIVE_FIELDS = (
+    ('text', _render_text),
+    ('pages', _render_pages),
+    ('references', _render_references),
+    ('notes', _render_notes),
+)
+
+
+def generate_evaluation_report_pdf(evaluation_data: dict, footer_timestamp: str | None = None) -> BytesIO:
+    """
+    Generate a comprehensive PDF report for grant evaluation
+    Returns a BytesIO buffer containing the PDF
+
+    footer_timestamp can be passed by batch callers so every report in the batch
+    shares one "Report generated on ..." value (see _footer_timestamp()).
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=2*cm,
+        leftMargin=2*cm,
+        topMargin=2*cm,
+        bottomMargin=2*cm
+    )
+    
+    # Container for the 'Flowable' objects
+    elements = []
+    
+    # Styles are invariant across reports, so they are built once and reused
+    report_styles = _report_styles()
+    title_style = report_styles['title']
+    heading_style = report_styles['heading']
+    subheading_style = report_styles['subheading']
+    normal_style = report_styles['normal']
+    small_style = report_styles['small']
+    
     # ============================================================
     # SECTION 1: COVER PAGE
     # ============================================================
@@ -84,8 +216,8 @@ def generate_evaluation_report_pdf(evaluation_data: dict) -> BytesIO:
     # Title
     elements.append(Paragraph("Grant Evaluation Report", title_style))
     elements.append(Spacer(1, 0.3*cm))
-    elements.append(Paragraph(f"<i>Domain: {evaluation_data.get('domain', 'Not Specified')}</i>", 
-                              ParagraphStyle('DomainStyle', parent=normal_style, alignment=TA_CENTER, textColor=colors.HexColor('#6366f1'))))
+    elements.append(Paragraph(f"<i>Domain: {_plain(evaluation_data.get('domain', 'Not Specified'))}</i>", 
+                              report_styles['domain']))
     elements.append(Spacer(1, 1*cm))
     
     # Table of Contents
@@ -120,7 +252,7 @@ def generate_evaluation_report_pdf(evaluation_data: dict) -> BytesIO:
     file_info_data = [
         ['File Name:', evaluation_data.get('file_name', 'N/A')],
         ['File Size:', f"{evaluation_data.get('file_size', 0) / 1024:.2f} KB"],
-        ['Evaluation Date:', datetime.fromisoformat(evaluation_data.get('created_at', datetime.now().isoformat())).strftime('%Y-%m-%d %H:%M:%S')],
+        ['Evaluation Date:', _format_evaluation_date(evaluation_data.get('created_at'))],
     ]
     
     file_info_table = Table(file_info_data, colWidths=[4*cm, 13*cm])
@@ -148,14 +280,7 @@ def generate_evaluation_report_pdf(evaluation_data: dict) -> BytesIO:
     }
     decision_color = decision_colors.get(decision, colors.grey)
     
-    decision_data = [[Paragraph(f"<b>DECISION: {decision}</b>", ParagraphStyle(
-        'DecisionStyle',
-        parent=styles['Normal'],
-        fontSize=18,
-        textColor=colors.white,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    ))]]
+    decision_data = [[Paragraph(f"<b>DECISION: {_plain(decision)}</b>", report_styles['decision'])]]
     
     decision_table = Table(decision_data, colWidths=[17*cm])
     decision_table.setStyle(TableStyle([
@@ -181,7 +306,8 @@ def generate_evaluation_report_pdf(evaluation_data: dict) -> BytesIO:
     else:
         bar_color = colors.HexColor('#ef4444')
     
-    # Draw filled score bar using drawing primitives
+    # Draw filled score bar using drawing primitives (graphics package is only needed here)
+    from reportlab.graphics.shapes import Drawing, Rect
     score_percentage = max(0.0, min(overall_score / 10, 1.0))
     bar_width = 17 * cm
     bar_height = 0.8 * cm
@@ -208,50 +334,22 @@ def generate_evaluation_report_pdf(evaluation_data: dict) -> BytesIO:
     elements.append(Spacer(1, 0.5*cm))
     
     summary_data = evaluation_data.get('summary', {})
-    if summary_data and isinstance(summary_data, dict):
+    # Payloads are plain JSON/BSON-decoded dicts and lists, so exact type checks suffice
+    if summary_data and type(summary_data) is dict:
         for section_name, section_content in summary_data.items():
-            if not isinstance(section_content, dict):
+            if type(section_content) is not dict or _is_empty_section(section_content):
                 continue
                 
             # Format section name (e.g., "ExpectedOutcomes" -> "Expected Outcomes")
-            formatted_section = re.sub(r'([a-z])([A-Z])', r'\1 \2', section_name) if isinstance(section_name, str) else section_name
-            formatted_section = ' '.join([word.capitalize() if word.lower() not in ['and', 'of', 'the'] else word for word in formatted_section.split()])
+            formatted_section = _CAMEL_CASE_BOUNDARY.sub(r'\1 \2', section_name) if isinstance(section_name, str) else section_name
+            formatted_section = ' '.join(word if word.lower() in _TITLE_STOPWORDS else word.capitalize() for word in formatted_section.split())
             
             section_box = []
-            section_box.append(Paragraph(f"<b>{formatted_section}</b>", subheading_style))
-            
-            # Text content
-            text = section_content.get('text', '')
-            if text and text != 'Not provided':
-                section_box.append(Paragraph(text, normal_style))
-                section_box.append(Spacer(1, 0.3*cm))
-            
-            # Pages
-            pages = section_content.get('pages', [])
-            if pages:
-                pages_text = f"<b>Pages:</b> {', '.join(map(str, pages))}"
-                section_box.append(Paragraph(pages_text, small_style))
-                section_box.append(Spacer(1, 0.2*cm))
+            section_box.append(Paragraph(f"<b>{_plain(formatted_section)}</b>", subheading_style))
             
-            # References
-            references = section_content.get('references', [])
-            if references and isinstance(references, list):
-                section_box.append(Paragraph("<b>Key References:</b>", small_style))
-                for ref in references[:5]:  # Limit to first 5 references
-                    section_box.append(Paragraph(f"• {ref}", small_style))
-                if len(references) > 5:
-                    section_box.append(Paragraph(f"<i>... and {len(references) - 5} more</i>", small_style))
-                section_box.append(Spacer(1, 0.2*cm))
-            
-            # Notes
-            notes = section_content.get('notes', '')
-            if notes:
-                if isinstance(notes, list):
-                    section_box.append(Paragraph("<b>Notes:</b>", small_style))
-                    for note in notes:
-                        section_box.append(Paragraph(f"• {note}", small_style))
-                elif isinstance(notes, str) and notes:
-                    section_box.append(Paragraph(f"<b>Notes:</b> {notes}", small_style))
+            # Text, pages, references and notes, in display order
+            for field, render in _NARRATIVE_FIELDS:
+                render(section_box, section_content.get(field), normal_style, small_style)
             
             # Add the section as a KeepTogether block
             elements.append(KeepTogether(section_box))
@@ -297,23 +395,23 @@ def generate_evaluation_report_pdf(evaluation_data: dict) -> BytesIO:
         elements.append(Spacer(1, 0.8*cm))
         for score_item in scores:
             category = score_item.get('category', 'N/A')
-            elements.append(Paragraph(f"<b>{category}</b>", subheading_style))
+            elements.append(Paragraph(f"<b>{_plain(category)}</b>", subheading_style))
             
-            strengths = score_item.get('strengths') or []
-            if not strengths:
-                strengths = ['No standout strengths recorded.']
+            elements.append(Paragraph("<b>Strengths:</b>", normal_style))
+            strengths = score_item.get('strengths')
             if strengths:
-                elements.append(Paragraph("<b>Strengths:</b>", normal_style))
                 for strength in strengths:
-                    elements.append(Paragraph(f"• {strength}", normal_style))
+                    elements.append(Paragraph(f"• {_plain(strength)}", normal_style))
+            else:
+                elements.append(Paragraph(_NO_STRENGTHS_MARKUP, normal_style))
             
-            weaknesses = score_item.get('weaknesses') or []
-            if not weaknesses:
-                weaknesses = ['No critical weaknesses identified.']
+            elements.append(Paragraph("<b>Weaknesses:</b>", normal_style))
+            weaknesses = score_item.get('weaknesses')
             if weaknesses:
-                elements.append(Paragraph("<b>Weaknesses:</b>", normal_style))
                 for weakness in weaknesses:
-                    elements.append(Paragraph(f"• {weakness}", normal_style))
+                    elements.append(Paragraph(f"• {_plain(weakness)}", normal_style))
+            else:
+                elements.append(Paragraph(_NO_WEAKNESSES_MARKUP, normal_style))
             
             elements.append(Spacer(1, 0.5*cm))
     
@@ -365,11 +463,11 @@ def generate_evaluation_report_pdf(evaluation_data: dict) -> BytesIO:
     
     if full_critique:
         # Summary
-        summary = full_critique.get('summary') if isinstance(full_critique, dict) else None
+        summary = full_critique.get('summary') if type(full_critique) is dict else None
         if not isinstance(summary, str) or not summary.strip():
             summary = 'No executive summary was generated.'
         elements.append(Paragraph("<b>Executive Summary:</b>", subheading_style))
-        elements.append(Paragraph(summary, normal_style))
+        elements.append(Paragraph(_plain(summary), normal_style))
         elements.append(Spacer(1, 0.8*cm))
         
         # Issues
@@ -388,7 +486,7 @@ def generate_evaluation_report_pdf(evaluation_data: dict) -> BytesIO:
                 category = issue.get('category', 'General')
                 description = issue.get('description', 'No description.')
                 
-                issue_text = f"<b>[{severity.upper()}]</b> <b>{category}:</b> {description}"
+                issue_text = f"<b>[{_plain(severity.upper())}]</b> <b>{_plain(category)}:</b> {_plain(description)}"
                 elements.append(Paragraph(issue_text, normal_style))
                 elements.append(Spacer(1, 0.3*cm))
             
@@ -402,7 +500,7 @@ def generate_evaluation_report_pdf(evaluation_data: dict) -> BytesIO:
                 priority = rec.get('priority', 'medium')
                 recommendation = rec.get('recommendation', 'No recommendation.')
                 
-                rec_text = f"<b>[{priority.upper()} Priority]</b> {recommendation}"
+                rec_text = f"<b>[{_plain(priority.upper())} Priority]</b> {_plain(recommendation)}"
                 elements.append(Paragraph(rec_text, normal_style))
                 elements.append(Spacer(1, 0.3*cm))
     
@@ -461,7 +559,7 @@ def generate_evaluation_report_pdf(evaluation_data: dict) -> BytesIO:
                     'info': colors.HexColor('#3b82f6')
                 }
                 
-                flag_text = f"<b>[{flag_type.upper()}]</b> {message}"
+                flag_text = f"<b>[{_plain(flag_type.upper())}]</b> {_plain(message)}"
                 elements.append(Paragraph(flag_text, normal_style))
                 elements.append(Spacer(1, 0.3*cm))
             
@@ -471,7 +569,7 @@ def generate_evaluation_report_pdf(evaluation_data: dict) -> BytesIO:
         budget_summary = budget_analysis.get('summary', '')
         if budget_summary:
             elements.append(Paragraph("<b>Budget Summary:</b>", subheading_style))
-            elements.append(Paragraph(budget_summary, normal_style))
+            elements.append(Paragraph(_plain(budget_summary), normal_style))
     
     # ============================================================
     # SECTION 7: PLAGIARISM CHECK (if available)
@@ -497,14 +595,7 @@ def generate_evaluation_report_pdf(evaluation_data: dict) -> BytesIO:
         }
         risk_color = risk_colors.get(risk_level, colors.grey)
         
-        risk_data = [[Paragraph(f"<b>Risk Level: {risk_level}</b>", ParagraphStyle(
-            'RiskStyle',
-            parent=styles['Normal'],
-            fontSize=14,
-            textColor=colors.white,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        ))]]
+        risk_data = [[Paragraph(f"<b>Risk Level: {_plain(risk_level)}</b>", report_styles['risk'])]]
         
         risk_table = Table(risk_data, colWidths=[17*cm])
         risk_table.setStyle(TableStyle([
@@ -525,16 +616,12 @@ def generate_evaluation_report_pdf(evaluation_data: dict) -> BytesIO:
         # Matched reference text
         if matched_text:
             elements.append(Paragraph("<b>Matched Reference Text:</b>", subheading_style))
-            elements.append(Paragraph(matched_text, normal_style))
+            elements.append(Paragraph(_plain(matched_text), normal_style))
             elements.append(Spacer(1, 0.5*cm))
         
         # Error message
         if error:
-            elements.append(Paragraph(f"<b>Note:</b> {error}", ParagraphStyle(
-                'ErrorStyle',
-                parent=normal_style,
-                textColor=colors.HexColor('#ef4444')
-            )))
+            elements.append(Paragraph(f"<b>Note:</b> {_plain(error)}", report_styles['error']))
         
         # Interpretation
         elements.append(Spacer(1, 0.5*cm))
@@ -557,12 +644,12 @@ def generate_evaluation_report_pdf(evaluation_data: dict) -> BytesIO:
     
     elements.append(Spacer(1, 2*cm))
     elements.append(Paragraph(
-        f"<i>Report generated on {datetime.now().strftime('%Y-%m-%d at %H:%M:%S')}</i>",
-        ParagraphStyle('FooterStyle', parent=small_style, alignment=TA_CENTER, textColor=colors.HexColor('#9ca3af'))
+        f"<i>Report generated on {footer_timestamp or _footer_timestamp()}</i>",
+        report_styles['footer']
     ))
     elements.append(Paragraph(
         "<i>Powered by AI Grant Evaluator</i>",
-        ParagraphStyle('PoweredStyle', parent=small_style, alignment=TA_CENTER, textColor=colors.HexColor('#9ca3af'))
+        report_styles['footer']
     ))
     
     # Build PDF
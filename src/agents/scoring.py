@@ -1,116 +1,228 @@
-from src.llm_wrapper import gemini_llm
-import json
-from src.prompts import SCORING_PROMPT
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import get_args
+from src.llm_wrapper import structured_llm
+import orjson
+from src.prompts import prompt_parts
+from src.agents.json_utils import strip_codeblock, try_parse_json
+from src.schemas import ScoredSection, SectionScore, ScoringOutput
 import re
 
-def strip_codeblock(text: str) -> str:
-    """
-    Remove Markdown-style code block wrappers (```json ... ```) if present.
-    """
-    return re.sub(r"^```(?:json)?\n|```$", "", text.strip(), flags=re.MULTILINE)
+# SCORING_PER_SECTION=1 scores each section in its own, smaller call and runs them in
+# parallel (up to SCORING_MAX_WORKERS at once) instead of one long 10-section response.
+# More requests per proposal, so it is off by default.
+SCORING_PER_SECTION = os.getenv("SCORING_PER_SECTION", "0") == "1"
+SCORING_MAX_WORKERS = int(os.getenv("SCORING_MAX_WORKERS", "5"))
+
+# JSON tokens that affect nesting: string literals (group 1 is None when the
+# string is unterminated) and braces/brackets outside of strings
+_JSON_STRUCTURE_RE = re.compile(r'"(?:[^"\\]|\\.)*(")?|[{}\[\]]', re.DOTALL)
+
+# Section names that identify a flat {section: {...}} response missing the "scores" wrapper
+_SECTION_NAMES = frozenset((
+    "Objectives", "Methodology", "Budget", "Innovation", "Impact",
+    "Feasibility", "Background", "Timeline", "Team", "Sustainability",
+    "CoverLetter", "EvaluationPlan", "ExpectedOutcomes", "LettersOfSupport",
+))
+_SCORED_SECTIONS = frozenset(get_args(ScoredSection))
 
 
 def repair_json(text: str) -> str:
     """
     Attempt to repair common JSON issues like unterminated strings.
+
+    Scans the text once, skipping over string literals, and tracks the open
+    objects/arrays on a stack so truncated output is closed in the right order.
     """
-    # Try to find where the JSON actually ends
-    # Look for the last complete object before truncation
+    string_open = False
+    closers = []
+    for match in _JSON_STRUCTURE_RE.finditer(text):
+        token = match.group()
+        if token == '{':
+            closers.append('}')
+        elif token == '[':
+            closers.append(']')
+        elif token == '}' or token == ']':
+            if closers and closers[-1] == token:
+                closers.pop()
+        else:
+            string_open = match.group(1) is None
     
-    # If there's an unterminated string, try to close it
-    if text.count('"') % 2 != 0:
-        # Find the last quote and add a closing quote
+    # If there's an unterminated string, close it
+    if string_open:
         text = text + '"'
+    elif closers:
+        # A dangling comma before the closers would still be invalid JSON
+        text = text.rstrip()
+        if text.endswith(','):
+            text = text[:-1]
     
-    # Count braces to see if we need to close them
-    open_braces = text.count('{')
-    close_braces = text.count('}')
-    if open_braces > close_braces:
-        text = text + ('}' * (open_braces - close_braces))
-    
-    # Count brackets
-    open_brackets = text.count('[')
-    close_brackets = text.count(']')
-    if open_brackets > close_brackets:
-        text = text + (']' * (open_brackets - close_brackets))
-    
-    return text
+    # Close any objects/arrays left open by truncation, innermost first
+    return text + ''.join(reversed(closers))
 
 
-def run_grant_scoring(summary_json, domain: str):
+def run_grant_scoring(summary_json, domain: str, early_scores: dict | None = None):
     """
     Pass a structured grant summary JSON to Gemini LLM and get section-wise scores.
     NOTE: These scores are *raw* — adaptive weighting happens later in backend.
+    `early_scores` comes from early_section_scorer (per-section mode only).
     """
+    if SCORING_PER_SECTION and isinstance(summary_json, dict):
+        return _score_sections(summary_json, domain, early_scores or {})
+
     # Convert summary to JSON string for the prompt
-    grant_json_str = json.dumps(summary_json, indent=2)
+    grant_json_str = orjson.dumps(summary_json, option=orjson.OPT_INDENT_2).decode()
 
-    # Prepare full prompt WITH DOMAIN CONTEXT
-    prompt = SCORING_PROMPT.format(grant_json=grant_json_str, domain=domain)
+    # Only the per-call tail (domain + summary) is formatted; the static prefix is sent as-is
+    prompt = prompt_parts("scoring", grant_json=grant_json_str, domain=domain)
 
-    # Call Gemini LLM with increased token limit for complete JSON
-    response = gemini_llm(prompt, max_output_tokens=8192)
+    # Call Gemini LLM with increased token limit for complete JSON. The output shape is
+    # enforced by the ScoringOutput response schema; it is only parsed once complete, so the
+    # call is not streamed.
+    scores_json, response = structured_llm(
+        prompt, ScoringOutput, max_output_tokens=8192
+    )
+    if scores_json is not None:
+        return _pivot_scores(scores_json)
 
     cleaned_response = strip_codeblock(response)
 
+    # Cheap prefilter: a response that is not a JSON object mentioning a score cannot be
+    # parsed or repaired into one, so skip both parse attempts
+    if not cleaned_response.startswith("{") or '"score"' not in cleaned_response:
+        return _fallback_scores(cleaned_response)
+
     # Parse JSON safely
-    try:
-        scores_json = json.loads(cleaned_response)
-        
-        # Validate expected structure
-        if not isinstance(scores_json, dict):
-            raise ValueError("Expected dict from scoring agent")
-        
-        # Check if "scores" key is missing - try to detect if it's a flat structure
-        if "scores" not in scores_json:
-            # Check if this looks like section scores directly (has section names)
-            section_names = ["Objectives", "Methodology", "Budget", "Innovation", "Impact", 
-                           "Feasibility", "Background", "Timeline", "Team", "Sustainability"]
-            
-            if any(section in scores_json for section in section_names):
-                # Wrap flat structure into expected format
-                scores_json = {
-                    "scores": scores_json,
-                    "overall_summary": scores_json.get("overall_summary", "")
-                }
+    ok, scores_json = try_parse_json(cleaned_response)
+    if ok:
+        scores_json = _normalise_scores(scores_json)
+    if not ok or scores_json is None:
+        scores_json = _repair_scores(cleaned_response)
+
+    return scores_json
+
+
+def _normalise_scores(value):
+    """
+    Return `value` in the {"scores": {...}, ...} shape, or None if it does not look like scores.
+    """
+    if not isinstance(value, dict):
+        return None
+    if "scores" in value:
+        return _pivot_scores(value)
+    # Check if this looks like section scores directly (has section names)
+    if not _SECTION_NAMES.isdisjoint(value):
+        # Wrap flat structure into expected format
+        return {
+            "scores": value,
+            "overall_summary": value.get("overall_summary", "")
+        }
+    # If neither "scores" key nor section names found, this is malformed
+    return None
+
+
+def early_section_scorer(domain: str, pool: ThreadPoolExecutor):
+    """
+    Start scoring sections while the summary is still being generated (SCORING_PER_SECTION).
+
+    Returns (on_section, early_scores): pass `on_section` to run_summarizer_extended and
+    `early_scores` to run_grant_scoring, which reuses each early score whose section text
+    matches the final summary and scores the rest itself.
+    """
+    early_scores = {}
+
+    def on_section(section, value):
+        if section in _SCORED_SECTIONS:
+            early_scores[section] = (value, pool.submit(_score_section, section, value, domain))
+
+    return on_section, early_scores
+
+
+def _score_sections(summary_json: dict, domain: str, early_scores: dict) -> dict:
+    """Score every section with its own call, in parallel. Sections whose call fails are left out."""
+    sections = get_args(ScoredSection)
+    with ThreadPoolExecutor(max_workers=min(SCORING_MAX_WORKERS, len(sections))) as pool:
+        futures = []
+        for section in sections:
+            value = summary_json.get(section, "Not provided")
+            early = early_scores.get(section)
+            if early is not None and early[0] == value:
+                futures.append(early[1])
             else:
-                # If neither "scores" key nor section names found, this is malformed
-                raise ValueError("Response has neither 'scores' key nor section names")
-            
-    except (json.JSONDecodeError, ValueError) as e:
-        # Try to repair the JSON
-        try:
-            repaired = repair_json(cleaned_response)
-            scores_json = json.loads(repaired)
-            
-            # Validate repaired JSON also has proper structure
-            if "scores" not in scores_json:
-                section_names = ["Objectives", "Methodology", "Budget", "Innovation", "Impact"]
-                if any(section in scores_json for section in section_names):
-                    scores_json = {
-                        "scores": scores_json,
-                        "overall_summary": scores_json.get("overall_summary", "")
-                    }
+                futures.append(pool.submit(_score_section, section, value, domain))
+        results = [future.result() for future in futures]
+
+    scores = {section: result for section, result in zip(sections, results) if result is not None}
+    if not scores:
+        return _fallback_scores("")
+    # Per-section calls never see the whole proposal, so there is no cross-section summary
+    return {"scores": scores, "overall_summary": ""}
+
+
+def _score_section(section: str, section_value, domain: str) -> dict | None:
+    section_json = orjson.dumps(section_value, option=orjson.OPT_INDENT_2).decode()
+    prompt = prompt_parts("section_scoring", section_name=section, section_json=section_json, domain=domain)
+    try:
+        result, _ = structured_llm(prompt, SectionScore)
+    except Exception as e:
+        print(f"[WARNING] Scoring {section} failed: {e}")
+        return None
+    if result is None:
+        print(f"[WARNING] Scoring {section} returned no valid entry")
+        return None
+    result.pop("section", None)
+    return result
+
+
+def _pivot_scores(scores_json: dict) -> dict:
+    """Turn the schema's [{"section": ..., ...}, ...] records into the {section: {...}} map used downstream."""
+    records = scores_json["scores"]
+    if isinstance(records, list):
+        # Validated output has every section exactly once (ScoringOutput); the raw-text
+        # fallback may not, so keep the first entry per section and say what is missing
+        scores = {}
+        for entry in records:
+            if isinstance(entry, dict) and "section" in entry:
+                section = entry.pop("section")
+                if section in scores:
+                    print(f"[WARNING] Duplicate score entry for {section}; keeping the first")
                 else:
-                    raise ValueError("Repaired JSON still malformed")
-                    
-        except Exception as repair_error:
-            # Last resort: Return minimal valid structure to prevent crash
-            # Initialize with default sections based on common grant structure
-            scores_json = {
-                "scores": {
-                    "Objectives": {"score": 0.0, "feedback": "Error: Unable to parse LLM response"},
-                    "Methodology": {"score": 0.0, "feedback": "Error: Unable to parse LLM response"},
-                    "Budget": {"score": 0.0, "feedback": "Error: Unable to parse LLM response"},
-                    "Impact": {"score": 0.0, "feedback": "Error: Unable to parse LLM response"},
-                },
-                "overall_summary": "Error: LLM returned invalid JSON - please retry evaluation",
-                "raw_response": cleaned_response[:1000]  # Truncate to avoid huge error messages
-            }
+                    scores[section] = entry
+        missing = _SCORED_SECTIONS.difference(scores)
+        if missing:
+            print(f"[WARNING] Scoring response has no entry for: {', '.join(sorted(missing))}")
+        scores_json["scores"] = scores
+    return scores_json
+
 
+def _repair_scores(cleaned_response: str) -> dict:
+    """
+    Slow path: repair truncated/malformed JSON, or fall back to the default structure.
+    """
+    ok, scores_json = try_parse_json(repair_json(cleaned_response))
+    if ok:
+        scores_json = _normalise_scores(scores_json)
+    if not ok or scores_json is None:
+        # Last resort: Return minimal valid structure to prevent crash
+        scores_json = _fallback_scores(cleaned_response)
     return scores_json
 
 
+def _fallback_scores(cleaned_response: str) -> dict:
+    """Minimal valid structure with default sections based on common grant structure."""
+    return {
+        "scores": {
+            "Objectives": {"score": 0.0, "feedback": "Error: Unable to parse LLM response"},
+            "Methodology": {"score": 0.0, "feedback": "Error: Unable to parse LLM response"},
+            "Budget": {"score": 0.0, "feedback": "Error: Unable to parse LLM response"},
+            "Impact": {"score": 0.0, "feedback": "Error: Unable to parse LLM response"},
+        },
+        "overall_summary": "Error: LLM returned invalid JSON - please retry evaluation",
+        "raw_response": cleaned_response[:1000]  # Truncate to avoid huge error messages
+    }
+
+
+from math import fsum
 from src.config.domain_weights import DOMAIN_WEIGHTS
 
 def compute_weighted_score(section_scores: dict, domain: str) -> float:
@@ -118,9 +230,7 @@ def compute_weighted_score(section_scores: dict, domain: str) -> float:
     if not weights:
         raise ValueError(f"No weight configuration found for domain: {domain}")
 
-    score = 0
-    for section, data in section_scores.items():
-        if section in weights:
-            score += data["score"] * weights[section]
+    score = fsum(data["score"] * weights[section]
+                 for section, data in section_scores.items() if section in weights)
 
     return round(score, 2)
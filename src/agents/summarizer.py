@@ -1,49 +1,9 @@
-# # src/agents/summarizer_agent.py
-# from src.llm_wrapper import gemini_llm
-# import json
-# from src.prompts import SUMMARY_PROMPT
-
-# def run_summarizer_extended(retriever_fn, query="Provide a structured summary of this grant proposal"):
-#     """
-#     Fetch chunks via retriever_fn and return structured summary JSON with:
-#     - pages
-#     - references
-#     - notes
-#     """
-
-#     retrieved_docs = retriever_fn(query)
-
-#     if not retrieved_docs:
-#         return {}
-
-#     # Combine text with page numbers for LLM
-#     context_text = ""
-#     for doc in retrieved_docs:
-#         page_num = doc.get("page_number", "Unknown")
-#         text = doc.get("text", "")
-#         source = doc.get("source", "Unknown")
-#         context_text += f"[Page {page_num} | Source: {source}]\n{text}\n\n"
-
-#     # Prompt LLM
-#     prompt = SUMMARY_PROMPT.format(context=context_text)
-#     response = gemini_llm(prompt)
-
-#     # Parse JSON safely
-#     try:
-#         summary_json = json.loads(response)
-#     except json.JSONDecodeError:
-#         # If LLM fails to give valid JSON, return raw response for inspection
-#         summary_json = {"raw_response": response}
-
-#     print("=== LLM Raw Response ===")
-#     print(response)
-#     return summary_json
-
 # src/agents/summarizer_agent.py
-from src.llm_wrapper import gemini_llm
-import json
-import re
-from src.prompts import SUMMARY_PROMPT
+import os
+from itertools import zip_longest
+from src.llm_wrapper import cached_llm
+from src.prompts import prompt_parts
+from src.agents.json_utils import ObjectMemberStream, strip_codeblock, try_parse_json
 
 # Define all key grant sections
 GRANT_SECTIONS = [
@@ -59,13 +19,11 @@ GRANT_SECTIONS = [
     "LettersOfSupport"
 ]
 
-def strip_codeblock(text: str) -> str:
-    """
-    Remove Markdown-style code block wrappers (```json ... ```) if present.
-    """
-    return re.sub(r"^```(?:json)?\n|```$", "", text.strip(), flags=re.MULTILINE)
+# Upper bound on the retrieved context sent to the LLM (~4 characters per token, so the
+# default is roughly 24K input tokens). Keeps latency and cost bounded for large PDFs.
+SUMMARY_CONTEXT_CHARS = int(os.getenv("SUMMARY_CONTEXT_CHARS", "96000"))
 
-def run_summarizer_extended(retriever_fn, domain="General"):
+def run_summarizer_extended(retriever_fn, domain="General", on_section=None):
     """
     Fetch chunks via retriever_fn for each grant section and return
     a complete structured summary JSON with:
@@ -75,8 +33,13 @@ def run_summarizer_extended(retriever_fn, domain="General"):
     - notes
     
     Args:
-        retriever_fn: Function to retrieve relevant documents
+        retriever_fn: Function to retrieve relevant documents; called once with the
+            list of strategy queries and returning one result list per query
         domain: The academic/research domain for context (default: "General")
+        on_section: Optional callback(section, value). If given, the summary is streamed and
+            each section is passed on as soon as the model has finished writing it, so the
+            caller can start working on it early. Values are provisional: the returned
+            summary is authoritative (see cached_llm's on_chunk).
     """
     # Strategy 1: Get a larger set of documents with one comprehensive query
     comprehensive_query = (
@@ -87,43 +50,45 @@ def run_summarizer_extended(retriever_fn, domain="General"):
         "innovation, novel approach, unique features, and letters of support"
     )
     
-    all_docs = retriever_fn(comprehensive_query)
-    
     # Strategy 2: Add dedicated budget retrieval to ensure we capture dollar amounts
     budget_query = (
         "budget costs expenses funding financial dollars personnel equipment materials "
         "travel indirect costs line items budget breakdown total budget requested amount "
         "salaries stipends supplies overhead facilities administrative expenses"
     )
-    budget_docs = retriever_fn(budget_query)
     
     # Strategy 3: Add numeric/table retrieval for budget tables
     numeric_query = "$ dollars table cost breakdown itemized line items total amount"
-    numeric_docs = retriever_fn(numeric_query)
     
     # Strategy 4: Add outcomes and impact retrieval
     outcomes_query = (
         "expected outcomes results impact deliverables targets goals achievements "
         "reduce increase improve measure percent performance indicators success metrics"
     )
-    outcomes_docs = retriever_fn(outcomes_query)
     
     # Strategy 5: Add innovation and feasibility retrieval
     innovation_query = (
         "innovation innovative novel unique new approach cutting-edge original "
         "feasibility sustainability future funding capacity resources organizational support"
     )
-    innovation_docs = retriever_fn(innovation_query)
     
-    # Merge documents, avoiding duplicates
-    doc_ids = set()
+    # Run all five strategies as one batch: a single embedding call, concurrent searches
+    all_docs, budget_docs, numeric_docs, outcomes_docs, innovation_docs = retriever_fn([
+        comprehensive_query, budget_query, numeric_query, outcomes_query, innovation_query
+    ])
+    
+    # Merge documents, avoiding duplicates. Each strategy returns its chunks most relevant
+    # first, so interleave them by rank: every strategy's best chunks come before any tail
+    seen_texts = set()
     merged_docs = []
     
-    for doc in all_docs + budget_docs + numeric_docs + outcomes_docs + innovation_docs:
-        # Create unique ID based on content hash
-        doc_id = hash(doc.get('text', '')[:100])
-        if doc_id not in doc_ids:
-            doc_ids.add(doc_id)
+    ranked_docs = zip_longest(all_docs, budget_docs, numeric_docs, outcomes_docs, innovation_docs)
+    for doc in (doc for tier in ranked_docs for doc in tier if doc is not None):
+        # Key on the full chunk text: a 100-char prefix dropped distinct chunks
+        # that happened to start the same way (str caches its own hash)
+        text = doc.get('text', '')
+        if text not in seen_texts:
+            seen_texts.add(text)
             merged_docs.append(doc)
     
     if not merged_docs:
@@ -132,19 +97,33 @@ def run_summarizer_extended(retriever_fn, domain="General"):
     
     print(f"[INFO] Retrieved {len(merged_docs)} total chunks across {5} retrieval strategies")
     
+    # Cap the context: keep the highest-ranked chunks that fit in the character budget
+    budget_left = SUMMARY_CONTEXT_CHARS
+    capped_docs = []
+    for doc in merged_docs:
+        size = len(doc.get("text", ""))
+        if size <= budget_left:
+            capped_docs.append(doc)
+            budget_left -= size
+    if len(capped_docs) < len(merged_docs):
+        print(f"[INFO] Context capped at {SUMMARY_CONTEXT_CHARS} characters: "
+              f"kept {len(capped_docs)} of {len(merged_docs)} chunks")
+    merged_docs = capped_docs
+    
     # Sort by page number for coherent context
     try:
         docs_sorted = sorted(merged_docs, key=lambda d: int(d.get('page_number', 0)))
     except Exception:
         docs_sorted = merged_docs
     
-    # Build context text with page markers
-    context_text = ""
+    # Build context text with page markers (collect parts, join once)
+    context_parts = []
     for doc in docs_sorted:
         page_num = doc.get("page_number", "Unknown")
         text = doc.get("text", "")
         source = doc.get("source", "Unknown")
-        context_text += f"[Page {page_num} | Source: {source}]\n{text}\n\n"
+        context_parts.append(f"[Page {page_num} | Source: {source}]\n{text}\n\n")
+    context_text = "".join(context_parts)
     
     print(f"[INFO] Total context length: {len(context_text)} characters")
 
@@ -152,19 +131,32 @@ def run_summarizer_extended(retriever_fn, domain="General"):
         print("[WARNING] Context text is empty after building from docs")
         return {}
 
-    # Prepare full prompt with domain context
-    prompt = SUMMARY_PROMPT.format(context=context_text, domain=domain)
+    # Only the per-call tail (domain + context) is formatted; the static prefix is sent as-is
+    prompt = prompt_parts("summary", context=context_text, domain=domain)
+
+    # Call Gemini LLM (identical prompts are served from the response cache)
+    if on_section is None:
+        response = cached_llm(prompt)
+    else:
+        members = ObjectMemberStream()
 
-    # Call Gemini LLM
-    response = gemini_llm(prompt)
+        def on_chunk(chunk):
+            if chunk is None:
+                # The stream is being retried; sections already passed on stay provisional
+                members.reset()
+                return
+            for section, value in members.feed(chunk):
+                if section in GRANT_SECTIONS:
+                    on_section(section, value)
+
+        response = cached_llm(prompt, stream=True, on_chunk=on_chunk)
 
     # Strip code block if present
     clean_response = strip_codeblock(response)
 
     # Parse JSON safely
-    try:
-        summary_json = json.loads(clean_response)
-    except json.JSONDecodeError:
+    ok, summary_json = try_parse_json(clean_response)
+    if not ok:
         summary_json = {"raw_response": response}
 
     return summary_json
\ No newline at end of file
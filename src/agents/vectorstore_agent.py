@@ -1,11 +1,51 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from src.embeddings import get_embedder
-from src.vectorstore import create_vectorstore
+from src.vectorstore import create_vectorstore, open_cached_vectorstore, prune_vectorstore_cache
 from langchain.schema import Document
 
+# In-memory vectorstores keyed by the content of the pages they index (see vectorstore_agent).
+# Entries are {"agent", "persisted", "leases", "evicted"}: evicting an in-memory entry drops
+# its collection, but only once no evaluation holds a lease on it
+VECTORSTORE_POOL_SIZE = 8
+_vectorstore_pool: "OrderedDict[str, dict]" = OrderedDict()
+_vectorstore_pool_lock = threading.Lock()
+
+# Optional on-disk tier below the pool (set VECTORSTORE_CACHE_DIR to enable): each document
+# is persisted under its content hash, so re-evaluating it after a restart, or once it has
+# left the pool, skips embedding. FORCE_VECTORSTORE_REBUILD=1 re-embeds regardless. Only the
+# VECTORSTORE_CACHE_MAX_ENTRIES most recently used documents are kept on disk.
+VECTORSTORE_CACHE_DIR = os.getenv("VECTORSTORE_CACHE_DIR")
+FORCE_VECTORSTORE_REBUILD = os.getenv("FORCE_VECTORSTORE_REBUILD", "0") == "1"
+VECTORSTORE_CACHE_MAX_ENTRIES = int(os.getenv("VECTORSTORE_CACHE_MAX_ENTRIES", "64"))
+
+# Texts per embed_documents request; the HF endpoint takes a whole batch per HTTP call, but
+# very large documents in a single request risk payload limits and timeouts
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+
+
+def _pages_key(pages: list, config_path) -> str:
+    """SHA-256 over everything that determines the indexed chunks and their embeddings."""
+    digest = hashlib.sha256(f"{config_path}\x00".encode("utf-8"))
+    for p in pages:
+        digest.update(p.page_content.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(repr(sorted(p.metadata.items())).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
 def vectorstore_agent(pages: list, config_path="config.yaml", persist_dir=None, deterministic: bool = True):
     """
     Create vectorstore and return a retriever wrapper.
     
+    In-memory vectorstores are pooled by a content hash of the pages, so re-evaluating
+    the same document (e.g. with a different domain) skips re-embedding it. A different
+    document always gets its own collection, so evaluations stay isolated.
+    
     Args:
         pages: List of document pages
         config_path: Path to config file
@@ -13,26 +53,114 @@ def vectorstore_agent(pages: list, config_path="config.yaml", persist_dir=None,
         deterministic: Use deterministic retrieval settings
     
     Returns:
-        dict with 'vectorstore' and 'ask' function
+        dict with 'vectorstore' and 'ask' function, plus 'release' for pooled stores: call
+        it once the evaluation no longer queries the store, so an evicted collection can go
     """
-    # Use actual Document objects for Chroma, preserving metadata
-    documents = [Document(page_content=p.page_content, metadata=p.metadata) for p in pages]
+    if persist_dir is not None:
+        return _build_vectorstore_agent(pages, config_path, persist_dir)
+
+    key = _pages_key(pages, config_path)
+    with _vectorstore_pool_lock:
+        entry = _vectorstore_pool.get(key)
+        if entry is not None:
+            _vectorstore_pool.move_to_end(key)
+            entry["leases"] += 1
+            print("[INFO] Reusing vectorstore for identical document content")
+            return _leased(entry)
+
+    vs = _build_vectorstore_agent(pages, config_path, persist_dir, content_key=key)
+    entry = {"agent": vs, "persisted": bool(VECTORSTORE_CACHE_DIR), "leases": 1, "evicted": False}
+
+    idle = []
+    with _vectorstore_pool_lock:
+        # A concurrent evaluation of the same content may have pooled its own store meanwhile
+        replaced = _vectorstore_pool.pop(key, None)
+        if replaced is not None:
+            replaced["evicted"] = True
+            if replaced["leases"] == 0:
+                idle.append(replaced)
+        _vectorstore_pool[key] = entry
+        while len(_vectorstore_pool) > VECTORSTORE_POOL_SIZE:
+            old_entry = _vectorstore_pool.popitem(last=False)[1]
+            old_entry["evicted"] = True
+            if old_entry["leases"] == 0:
+                idle.append(old_entry)
+
+    for old_entry in idle:
+        _drop_collection(old_entry)
+    return _leased(entry)
+
+
+def _leased(entry: dict) -> dict:
+    """A copy of the pooled agent dict whose 'release' returns this lease (once)."""
+    released = False
+
+    def release():
+        nonlocal released
+        with _vectorstore_pool_lock:
+            if released:
+                return
+            released = True
+            entry["leases"] -= 1
+            drop = entry["evicted"] and entry["leases"] == 0
+        if drop:
+            _drop_collection(entry)
 
+    # Callers may delete keys from the returned dict; keep the pooled one intact
+    return {**entry["agent"], "release": release}
+
+
+def _drop_collection(entry: dict):
+    # The collection lives in the shared in-process client, so dropping the dict entry
+    # alone frees nothing; persisted collections are left for the on-disk cache
+    if entry["persisted"]:
+        return
+    try:
+        entry["agent"]["vectorstore"].delete_collection()
+    except Exception as e:
+        print(f"[WARNING] Could not drop evicted vectorstore collection: {e}")
+
+
+def _build_vectorstore_agent(pages: list, config_path, persist_dir, content_key: str | None = None):
     embedder = get_embedder(config_path)
-    
-    # Create vectorstore WITHOUT persistence by default (in-memory) to avoid contamination
-    # Each evaluation gets a fresh, isolated vectorstore
-    db = create_vectorstore(documents, embedder, persist_dir=persist_dir)
+
+    db = None
+    collection_name = None
+    if content_key is not None and VECTORSTORE_CACHE_DIR:
+        # Same content -> same directory and collection; different content never shares one
+        persist_dir = os.path.join(VECTORSTORE_CACHE_DIR, content_key[:32])
+        collection_name = f"eval_{content_key[:32]}"
+        if not FORCE_VECTORSTORE_REBUILD:
+            db = open_cached_vectorstore(embedder, persist_dir, collection_name)
+            if db is not None:
+                print("[INFO] Loaded cached vectorstore for identical document content")
+
+    if db is None:
+        # Use actual Document objects for Chroma, preserving metadata
+        documents = [Document(page_content=p.page_content, metadata=p.metadata) for p in pages]
+
+        # Embed the chunks in a few large batched calls and hand the vectors to Chroma directly
+        texts = [d.page_content for d in documents]
+        doc_embeddings = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            doc_embeddings.extend(embedder.embed_documents(texts[start:start + EMBED_BATCH_SIZE]))
+
+        # Create vectorstore WITHOUT persistence by default (in-memory) to avoid contamination
+        # Each document gets its own isolated collection
+        db = create_vectorstore(documents, embedder, persist_dir=persist_dir, doc_embeddings=doc_embeddings,
+                                collection_name=collection_name,
+                                replace=collection_name is not None and FORCE_VECTORSTORE_REBUILD)
+        if collection_name is not None:
+            prune_vectorstore_cache(VECTORSTORE_CACHE_DIR, VECTORSTORE_CACHE_MAX_ENTRIES, keep=persist_dir)
     
     # Use higher k value to retrieve more context (increased from 10 to 50)
     # This ensures we capture comprehensive information from the proposal
-    retriever = db.as_retriever(search_type="similarity", search_kwargs={"k": 50})
+    # MMR over a capped candidate pool keeps the five summarizer queries from
+    # returning the same top chunks over and over
+    search_kwargs = {"k": 50, "fetch_k": 100, "lambda_mult": 0.5}
+    retriever = db.as_retriever(search_type="mmr", search_kwargs=search_kwargs)
 
-    # wrapped retriever
-    def ask(query: str):
-        # Ensure a stable ordering of retrieved documents
-        # Use invoke() instead of deprecated get_relevant_documents()
-        retrieved_docs = retriever.invoke(query)
+    def to_records(retrieved_docs):
         return [
             {
                 "page_number": doc.metadata.get("page", "Unknown"),
@@ -41,5 +169,28 @@ def vectorstore_agent(pages: list, config_path="config.yaml", persist_dir=None,
             }
             for doc in retrieved_docs
         ]
+
+    # wrapped retriever
+    def ask(query):
+        """
+        Retrieve chunks for a single query (str), or for a list of queries.
+
+        A list is embedded in one batched embedder call and the searches run
+        concurrently; the result is one list of chunks per query, in order.
+        """
+        if isinstance(query, str):
+            # Use invoke() instead of deprecated get_relevant_documents()
+            return to_records(retriever.invoke(query))
+
+        queries = list(query)
+        if not queries:
+            return []
+        query_vectors = embedder.embed_documents(queries)
+        with ThreadPoolExecutor(max_workers=len(query_vectors)) as pool:
+            results = pool.map(
+                lambda vector: db.max_marginal_relevance_search_by_vector(vector, **search_kwargs),
+                query_vectors
+            )
+            return [to_records(docs) for docs in results]
     
     return {"vectorstore": db, "ask": ask}
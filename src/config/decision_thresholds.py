@@ -0,0 +1,13 @@
+# Decision thresholds on the final weighted score (0-10). Kept free of agent/LLM imports so
+# the decision rule can be used (and tested) without configuring the model client.
+ACCEPT_THRESHOLD = 8.0
+CONDITIONAL_THRESHOLD = 6.0
+
+
+def decide(final_weighted_score: float) -> str:
+    """Map the final weighted score to the funding decision."""
+    if final_weighted_score >= ACCEPT_THRESHOLD:
+        return "ACCEPT"
+    if final_weighted_score >= CONDITIONAL_THRESHOLD:
+        return "CONDITIONALLY ACCEPT"
+    return "REJECT"
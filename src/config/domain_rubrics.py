@@ -0,0 +1,58 @@
+from types import MappingProxyType
+
+# Short per-domain review guidance, appended to the per-call tail of the summary, scoring,
+# critique and budget prompts. Keeping it out of the static instructions leaves those
+# byte-identical across domains, so one cached prefix serves every domain.
+DOMAIN_RUBRICS = MappingProxyType({
+    "AI / Computer Science":
+        "Reward clear baselines, benchmark datasets, ablations, reproducible code/data release, and compute estimates.",
+    "Biotechnology / Life Sciences":
+        "Reward wet-lab protocol specificity, controls and replicates, biosafety/IRB/IACUC compliance, and reproducibility.",
+    "Healthcare / Medicine":
+        "Reward sound study design (power, endpoints, randomisation), patient safety, ethics approval, and clinical relevance.",
+    "Education / Learning Sciences":
+        "Reward evidence-based pedagogy, valid learning measures, comparison groups, equity of access, and scalability.",
+    "Environment / Climate / Sustainability":
+        "Reward measurable environmental indicators, field data quality, community/stakeholder engagement, and long-term monitoring.",
+    "Social Sciences / Policy":
+        "Reward clear theory, sampling and instrument validity, mixed-method rigour, ethics of human subjects, and policy uptake.",
+    "Engineering / Technology":
+        "Reward concrete specifications, prototyping and testing plans, technical risk mitigation, and path to deployment.",
+    "Physics / Materials Science":
+        "Reward theoretical grounding, experimental precision and error analysis, facility access, and characterisation plans.",
+    "Chemistry / Chemical Engineering":
+        "Reward synthesis/characterisation detail, safety and waste handling, yield and scale-up considerations.",
+    "Agriculture / Food Science":
+        "Reward field-trial design across seasons/sites, farmer adoption pathways, food safety, and yield or nutrition metrics.",
+    "Energy / Renewable Resources":
+        "Reward efficiency and cost metrics (e.g. LCOE), grid/integration realism, lifecycle impact, and demonstration scale.",
+    "Economics / Business":
+        "Reward identification strategy, data sources, market validation, financial projections, and measurable economic impact.",
+    "Arts / Humanities":
+        "Reward scholarly context, archival/source access, interpretive originality, and public engagement or dissemination.",
+    "Psychology / Behavioral Sciences":
+        "Reward preregistration, validated instruments, adequate sample size, ethics approval, and replication awareness.",
+    "Urban Planning / Architecture":
+        "Reward site analysis, community participation, regulatory/zoning feasibility, and sustainability of the built outcome.",
+    "Data Science / Statistics":
+        "Reward data provenance and quality, appropriate methods and validation, uncertainty quantification, and open tooling.",
+    "Cybersecurity / Information Security":
+        "Reward explicit threat models, responsible disclosure and ethics, realistic evaluation environments, and deployability.",
+    "Public Health / Epidemiology":
+        "Reward population-level design, surveillance/data access, bias and confounding control, and community partnerships.",
+    "Space Science / Astronomy":
+        "Reward instrument/observing-time access, data pipeline maturity, calibration, and mission or survey feasibility.",
+    "Marine Biology / Oceanography":
+        "Reward vessel/field logistics, sampling design across conditions, permits, and long-term ocean data stewardship.",
+    "Neuroscience / Cognitive Science":
+        "Reward rigorous experimental paradigms, imaging/recording methods, ethics approval, and link between mechanism and behaviour.",
+})
+
+DEFAULT_DOMAIN_RUBRIC = (
+    "Apply the methodological, ethical and feasibility standards customary in this field."
+)
+
+
+def domain_rubric(domain: str) -> str:
+    """Guidance for `domain`, or the generic rubric for unknown/free-text domains."""
+    return DOMAIN_RUBRICS.get(domain, DEFAULT_DOMAIN_RUBRIC)
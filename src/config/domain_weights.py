@@ -1,3 +1,6 @@
+from math import fsum
+from types import MappingProxyType
+
 DOMAIN_WEIGHTS = {
     "AI / Computer Science": {
         "Objectives": 0.15,
@@ -169,6 +172,23 @@ DOMAIN_WEIGHTS = {
     }
 }
 
+# Weights are configuration, not runtime state: expose them read-only
+DOMAIN_WEIGHTS = MappingProxyType({
+    domain: MappingProxyType(weights) for domain, weights in DOMAIN_WEIGHTS.items()
+})
+
+
+def _score_value(score_data) -> float:
+    """Extract the numeric score from either {"score": x, ...} or a bare number."""
+    if isinstance(score_data, dict):
+        return score_data.get("score", 0)
+    return score_data
+
+
+def _simple_average(scores: dict) -> float:
+    score_values = [_score_value(score_data) for score_data in scores.values()]
+    return fsum(score_values) / len(score_values) if score_values else 0.0
+
 
 def compute_section_weighted_score(scores: dict, domain: str) -> float:
     """
@@ -181,41 +201,24 @@ def compute_section_weighted_score(scores: dict, domain: str) -> float:
     Returns:
         Weighted average score (0-10 scale)
     """
-    if domain not in DOMAIN_WEIGHTS:
-        # Default to equal weights if domain not found
-        weights = {k: 1.0 / len(scores) for k in scores.keys()}
-    else:
-        weights = DOMAIN_WEIGHTS[domain]
+    weights = DOMAIN_WEIGHTS.get(domain)
+    if weights is None:
+        # Equal weights if domain not found, i.e. the plain average
+        return _simple_average(scores)
     
-    weighted_sum = 0.0
-    total_weight = 0.0
-    
-    for criterion, score_data in scores.items():
-        if criterion in weights:
-            # Extract numeric score from dict structure
-            if isinstance(score_data, dict):
-                score = score_data.get("score", 0)
-            else:
-                score = score_data
-            
-            weight = weights[criterion]
-            contribution = score * weight
-            weighted_sum += contribution
-            total_weight += weight
+    criteria = [criterion for criterion in scores if criterion in weights]
+    criterion_weights = [weights[criterion] for criterion in criteria]
     
     # Normalize by total weight to handle missing criteria
+    total_weight = fsum(criterion_weights)
     if total_weight > 0:
-        section_score = weighted_sum / total_weight
-        return section_score
-    else:
-        # Fallback to simple average
-        score_values = []
-        for score_data in scores.values():
-            if isinstance(score_data, dict):
-                score_values.append(score_data.get("score", 0))
-            else:
-                score_values.append(score_data)
-        return sum(score_values) / len(score_values) if score_values else 0.0
+        weighted_sum = fsum(
+            _score_value(scores[criterion]) * weight
+            for criterion, weight in zip(criteria, criterion_weights)
+        )
+        return weighted_sum / total_weight
+    # Fallback to simple average
+    return _simple_average(scores)
 
 
 def compute_critique_average(critique_domains: list) -> float:
@@ -0,0 +1,29 @@
+# The research domains a proposal can be assigned to, in display order. The UI dropdown,
+# the LLM classifier's label list and response enum, and the local classifier's labels
+# are all derived from this tuple, so every path chooses from the same set.
+DOMAINS = (
+    "AI / Computer Science",
+    "Biotechnology / Life Sciences",
+    "Healthcare / Medicine",
+    "Education / Learning Sciences",
+    "Environment / Climate / Sustainability",
+    "Social Sciences / Policy",
+    "Engineering / Technology",
+    "Physics / Materials Science",
+    "Chemistry / Chemical Engineering",
+    "Agriculture / Food Science",
+    "Energy / Renewable Resources",
+    "Economics / Business",
+    "Arts / Humanities",
+    "Psychology / Behavioral Sciences",
+    "Urban Planning / Architecture",
+    "Data Science / Statistics",
+    "Cybersecurity / Information Security",
+    "Public Health / Epidemiology",
+    "Space Science / Astronomy",
+    "Marine Biology / Oceanography",
+    "Neuroscience / Cognitive Science",
+)
+
+# Used when classification fails or returns something outside DOMAINS
+DEFAULT_DOMAIN = "Social Sciences / Policy"
@@ -1,6 +1,8 @@
 from langchain_huggingface import HuggingFaceEndpointEmbeddings
+from functools import lru_cache
 import os
 
+@lru_cache(maxsize=4)
 def get_embedder(config_path="config.yaml"):
     """
     Get embeddings using HuggingFace Inference API (zero memory, API-based).
@@ -10,6 +12,8 @@ def get_embedder(config_path="config.yaml"):
     
     Memory usage: ~0 MB (API calls only, no model loading)
     
+    The client is cached per config_path and reused across evaluations.
+    
     Get free API key from: https://huggingface.co/settings/tokens
     """
     hf_token = os.getenv("HUGGINGFACE_API_KEY") or os.getenv("HF_TOKEN")
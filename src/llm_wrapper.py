@@ -1,11 +1,22 @@
 # src/llm_wrapper.py
 import os
+import atexit
+import hashlib
 import logging
+import queue
+import sqlite3
+import threading
 import time
+from collections import OrderedDict
+from enum import Enum
+from functools import lru_cache
+from collections.abc import Callable, Iterator
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
+import orjson
 from dotenv import load_dotenv
 import google.generativeai as genai
-from datetime import datetime
+from pydantic import BaseModel, ValidationError
 
 load_dotenv()
 
@@ -18,64 +29,126 @@ genai.configure(api_key=api_key)
 DEFAULT_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.0"))
 DEFAULT_MAX_OUTPUT = int(os.getenv("LLM_MAX_OUTPUT", "8192"))
 DEFAULT_CANDIDATES = int(os.getenv("LLM_CANDIDATES", "1"))
+DEFAULT_MODEL = 'gemini-2.5-flash'
+
+# Attempts per call on transient API errors (500 / Internal / ResourceExhausted), with
+# exponential backoff starting at LLM_RETRY_DELAY seconds; streamed calls use the same policy
+LLM_MAX_RETRIES = 3
+LLM_RETRY_DELAY = 2
+
+# Re-prompts allowed after a structured response fails schema validation (see structured_llm)
+STRUCTURED_MAX_RETRIES = int(os.getenv("LLM_STRUCTURED_RETRIES", "2"))
+
+# Exact-match response cache for deterministic calls (see cached_llm)
+RESPONSE_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "128"))
+_response_cache: "OrderedDict[str, str]" = OrderedDict()
+_response_cache_lock = threading.Lock()
+# Part of every response cache key (memory and disk)
+CACHE_KEY_VERSION = "v1"
+# Lookup outcomes of cached_llm since start-up (see cache_stats); updated under the cache lock
+_cache_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+# GenerativeModel instances keyed by (model_name, temperature, max_output_tokens, candidate_count, response_schema)
+_model_cache: "dict[tuple, genai.GenerativeModel]" = {}
+_model_cache_lock = threading.Lock()
+
+# Optional explicit context caching of static prompt prefixes (enable with LLM_PREFIX_CACHE=1).
+# The first part of a multi-part prompt is uploaded once as a CachedContent and later calls
+# only send the per-call parts; Gemini bills cached tokens at a discount. Prefixes below the
+# API's minimum cacheable size (or failed uploads) are sent inline, as before, for one TTL.
+PREFIX_CACHE_ENABLED = os.getenv("LLM_PREFIX_CACHE", "0") == "1"
+PREFIX_CACHE_TTL_SECONDS = int(os.getenv("LLM_PREFIX_CACHE_TTL", "3600"))
+# (model_name, sha256 of prefix) -> (CachedContent or None if uncacheable, local expiry time)
+_prefix_caches: "dict[tuple[str, str], tuple[object | None, float]]" = {}
+_prefix_cache_lock = threading.Lock()
 
 LOG_DIR = Path(os.getenv("LLM_LOG_DIR", "logs"))
 LOG_DIR.mkdir(parents=True, exist_ok=True)
-LOG_FILE = LOG_DIR / "llm_calls.log"
-logging.basicConfig(
-    filename=str(LOG_FILE),
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)s | %(message)s'
-)
+LOG_FILE = LOG_DIR / os.getenv("LLM_LOG_FILE", "llm_calls.log")
+
+# Everything logged to LOG_FILE (the root logger's records and the JSON call records below)
+# goes through one queue and one file handler, written by a listener thread, so the file
+# I/O never blocks the calling thread and the file has a single writer.
+_log_queue = queue.Queue(-1)
+_log_file_handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
+_log_file_handler.setFormatter(logging.Formatter('%(asctime)s | %(levelname)s | %(message)s'))
+_log_listener = QueueListener(_log_queue, _log_file_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+# Like logging.basicConfig: only configure the root logger if nothing else has
+_root_logger = logging.getLogger()
+if not _root_logger.handlers:
+    _root_logger.addHandler(QueueHandler(_log_queue))
+    _root_logger.setLevel(logging.INFO)
 
+# Optional on-disk tier below the in-memory response cache, so deterministic responses
+# survive restarts (enable with LLM_CACHE=1). Least recently used rows are evicted.
+DISK_CACHE_ENABLED = os.getenv("LLM_CACHE", "0") == "1"
+DISK_CACHE_PATH = os.getenv("LLM_CACHE_DB", str(LOG_DIR / "llm_cache.sqlite"))
+DISK_CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_DB_ROWS", "10000"))
+_disk_cache: sqlite3.Connection | None = None
+_disk_cache_lock = threading.Lock()
 
-def gemini_llm(prompt: str,
+# Call records, one JSON object per message, always go to LOG_FILE through the shared queue,
+# whatever the root logger is configured with
+_llm_logger = logging.getLogger("llm_calls")
+_llm_logger.setLevel(os.getenv("LLM_LOG_LEVEL", "INFO").upper())
+_llm_logger.propagate = False
+_llm_logger.addHandler(QueueHandler(_log_queue))
+
+# Operational warnings (retries, fallbacks); the call records above go to _llm_logger
+_logger = logging.getLogger(__name__)
+
+# Flattens line breaks and tabs in log snippets in a single pass
+_WHITESPACE_TO_SPACE = str.maketrans("\n\r\t", "   ")
+
+
+def gemini_llm(prompt: str | list[str],
                temperature: float | None = None,
                max_output_tokens: int | None = None,
                candidate_count: int | None = None,
-               model_name: str = 'gemini-2.5-flash') -> str:
+               model_name: str = DEFAULT_MODEL,
+               response_schema: type[BaseModel] | None = None) -> str:
     """
     Call Gemini with deterministic defaults. Logs prompt and response to `logs/llm_calls.log`.
 
     Parameters are optional and will default to deterministic values unless overridden by env vars.
     
-    ISOLATION: Creates a fresh model instance for each call to prevent context contamination.
+    `prompt` may be a list of parts, e.g. [static_prefix, per_call_suffix]. Parts are sent as
+    separate content parts in order, so an unchanged static prefix stays byte-identical across
+    calls and can be served from Gemini's implicit prefix cache.
+
+    With `response_schema`, Gemini is put in JSON mode and constrained to that model's schema;
+    an Enum instead restricts the plain-text output to exactly one of its values.
+    
+    ISOLATION: Every call is a standalone generate_content request. Conversation state only
+    lives in ChatSession, which is never used here, so the (stateless) model instance can be
+    shared between calls without context contamination.
     """
+    prompt_text = prompt if isinstance(prompt, str) else "".join(prompt)
     temperature = DEFAULT_TEMPERATURE if temperature is None else temperature
     max_output_tokens = DEFAULT_MAX_OUTPUT if max_output_tokens is None else max_output_tokens
     candidate_count = DEFAULT_CANDIDATES if candidate_count is None else candidate_count
 
-    # Configure generation parameters
     # Increase max_output_tokens significantly for long JSON responses
     if max_output_tokens < 4096:
         max_output_tokens = 8192  # Ensure we have enough space for complete JSON
-    
-    generation_config = genai.GenerationConfig(
-        temperature=float(temperature),
-        max_output_tokens=int(max_output_tokens),
-        candidate_count=int(candidate_count)
-    )
-
-    # Create a fresh model instance for each call to prevent context contamination
-    model = genai.GenerativeModel(
-        model_name=model_name,
-        generation_config=generation_config
-    )
+
+    contents, cached_prefix = _split_cached_prefix(prompt, model_name)
+    model = _build_model(model_name, temperature, max_output_tokens, candidate_count, response_schema, cached_prefix)
 
     # Retry logic for transient API errors
-    max_retries = 3
-    retry_delay = 2  # seconds
+    max_retries = LLM_MAX_RETRIES
+    retry_delay = LLM_RETRY_DELAY  # seconds
     
     for attempt in range(max_retries):
         try:
-            response = model.generate_content(prompt)
+            response = model.generate_content(contents)
             break  # Success, exit retry loop
-        except TypeError:
-            response = model.generate_content(prompt)
-            break
         except Exception as e:
             error_msg = str(e)
-            is_retryable = "500" in error_msg or "Internal" in error_msg or "ResourceExhausted" in error_msg
+            is_retryable = _is_retryable(error_msg)
             
             if is_retryable and attempt < max_retries - 1:
                 print(f"[WARNING] API error on attempt {attempt + 1}/{max_retries}: {error_msg}")
@@ -91,7 +164,7 @@ def gemini_llm(prompt: str,
                     print("  - Rate limiting (too many requests)")
                     print("  - Input content too large")
                     print("  - Temporary API outage")
-                    print(f"  - Prompt length: {len(prompt)} characters")
+                    print(f"  - Prompt length: {len(prompt_text)} characters")
                 raise
 
     text = None
@@ -107,21 +180,370 @@ def gemini_llm(prompt: str,
         except Exception:
             text = str(response)
 
+    _log_call(model_name, temperature, max_output_tokens, candidate_count, prompt_text, text)
+
+    return text or ""
+
+
+def gemini_llm_stream(prompt: str | list[str],
+                      temperature: float | None = None,
+                      max_output_tokens: int | None = None,
+                      model_name: str = DEFAULT_MODEL,
+                      response_schema: type[BaseModel] | None = None) -> Iterator[str]:
+    """
+    Streaming variant of `gemini_llm`: yields response text chunks as they arrive.
+
+    Always generates a single candidate. Nothing is retried once chunks have been
+    yielded, so callers that need the complete text should fall back to `gemini_llm`
+    if iteration raises.
+    """
+    prompt_text = prompt if isinstance(prompt, str) else "".join(prompt)
+    temperature = DEFAULT_TEMPERATURE if temperature is None else temperature
+    max_output_tokens = DEFAULT_MAX_OUTPUT if max_output_tokens is None else max_output_tokens
+    if max_output_tokens < 4096:
+        max_output_tokens = 8192
+
+    contents, cached_prefix = _split_cached_prefix(prompt, model_name)
+    model = _build_model(model_name, temperature, max_output_tokens, 1, response_schema, cached_prefix)
+
+    parts = []
+    for chunk in model.generate_content(contents, stream=True):
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. a trailing finish-reason chunk)
+            continue
+        parts.append(text)
+        yield text
+
+    _log_call(model_name, temperature, max_output_tokens, 1, prompt_text, "".join(parts))
+
+
+def _build_model(model_name: str, temperature: float, max_output_tokens: int, candidate_count: int,
+                 response_schema: type[BaseModel] | None = None, cached_prefix=None):
+    """Return the model instance for this generation config, creating it on first use."""
+    cached_name = cached_prefix.name if cached_prefix is not None else None
+    key = (model_name, float(temperature), int(max_output_tokens), int(candidate_count), response_schema, cached_name)
+    with _model_cache_lock:
+        model = _model_cache.get(key)
+        if model is None:
+            generation_config = genai.GenerationConfig(
+                temperature=key[1],
+                max_output_tokens=key[2],
+                candidate_count=key[3],
+                response_mime_type=_response_mime_type(response_schema),
+                response_schema=response_schema
+            )
+            if cached_prefix is not None:
+                model = genai.GenerativeModel.from_cached_content(
+                    cached_prefix,
+                    generation_config=generation_config
+                )
+            else:
+                model = genai.GenerativeModel(
+                    model_name=model_name,
+                    generation_config=generation_config
+                )
+            _model_cache[key] = model
+    return model
+
+
+def _response_mime_type(response_schema) -> str | None:
+    if response_schema is None:
+        return None
+    if isinstance(response_schema, type) and issubclass(response_schema, Enum):
+        return "text/x.enum"
+    return "application/json"
+
+
+def _split_cached_prefix(prompt: str | list[str], model_name: str):
+    """
+    Return (contents to send, CachedContent or None).
+
+    With LLM_PREFIX_CACHE=1 and a multi-part prompt, the first part is served from its
+    CachedContent and only the remaining parts are sent.
+    """
+    if PREFIX_CACHE_ENABLED and not isinstance(prompt, str) and len(prompt) > 1:
+        cached_prefix = _cached_prefix(model_name, prompt[0])
+        if cached_prefix is not None:
+            return prompt[1:], cached_prefix
+    return prompt, None
+
+
+def _cached_prefix(model_name: str, prefix: str):
+    """Return the live CachedContent for `prefix`, creating (or renewing) it when needed."""
+    key = (model_name, hashlib.sha256(prefix.encode("utf-8")).hexdigest())
+    now = time.time()
+    with _prefix_cache_lock:
+        entry = _prefix_caches.get(key)
+        if entry is not None and now < entry[1]:
+            return entry[0]
+        if entry is not None and entry[0] is not None:
+            # Expired: drop the models bound to the old cache before replacing it
+            with _model_cache_lock:
+                for model_key in [k for k in _model_cache if k[-1] == entry[0].name]:
+                    del _model_cache[model_key]
+        try:
+            cached = genai.caching.CachedContent.create(
+                model=model_name,
+                contents=[prefix],
+                ttl=PREFIX_CACHE_TTL_SECONDS
+            )
+            # Renew a minute early so no call races the server-side expiry
+            expires = now + PREFIX_CACHE_TTL_SECONDS - 60
+        except Exception as e:
+            print(f"[WARNING] Could not cache prompt prefix ({len(prefix)} chars), sending it inline: {e}")
+            cached, expires = None, now + PREFIX_CACHE_TTL_SECONDS
+        _prefix_caches[key] = (cached, expires)
+        return cached
+
+
+def _log_call(model_name, temperature, max_output_tokens, candidate_count, prompt_text, text):
+    # Skip building the entry entirely when call logging is switched off
+    if not _llm_logger.isEnabledFor(logging.INFO):
+        return
     try:
         log_entry = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": time.time(),
             "model": model_name,
             "temperature": temperature,
             "max_output_tokens": max_output_tokens,
             "candidate_count": candidate_count,
-            "prompt_snippet": prompt[:200].replace('\n', ' '),
-            "response_snippet": (text or '')[:500].replace('\n', ' ')
+            "prompt_snippet": prompt_text[:200].translate(_WHITESPACE_TO_SPACE),
+            "response_snippet": (text or '')[:500].translate(_WHITESPACE_TO_SPACE)
         }
-        logging.info(log_entry)
+        _llm_logger.info(orjson.dumps(log_entry).decode())
     except Exception:
         pass
 
-    return text or ""
+
+
+@lru_cache(maxsize=64)
+def _schema_fingerprint(response_schema: type[BaseModel] | type[Enum]) -> str:
+    """
+    Name plus a hash of the schema's shape: editing a schema's fields (or an Enum's values)
+    invalidates the responses cached under it.
+    """
+    if issubclass(response_schema, Enum):
+        shape = [member.value for member in response_schema]
+    else:
+        shape = response_schema.model_json_schema()
+    digest = hashlib.sha256(orjson.dumps(shape, option=orjson.OPT_SORT_KEYS)).hexdigest()[:16]
+    return f"{response_schema.__qualname__}:{digest}"
+
+
+def _cache_key(prompt: str | list[str], model_name: str, temperature: float, max_output_tokens: int | None,
+               response_schema: type[BaseModel] | None = None) -> str:
+    """
+    SHA-256 over everything that determines a deterministic response.
+
+    Every field is length-prefixed, so no two different (config, prompt parts) combinations
+    can hash the same byte stream. Bump CACHE_KEY_VERSION to invalidate all stored responses.
+    """
+    schema_id = _schema_fingerprint(response_schema) if response_schema is not None else ""
+    digest = hashlib.sha256(CACHE_KEY_VERSION.encode("utf-8"))
+    fields = [model_name, str(temperature), str(max_output_tokens), schema_id]
+    fields.extend([prompt] if isinstance(prompt, str) else prompt)
+    for field in fields:
+        data = field.encode("utf-8")
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def _is_retryable(error_msg: str) -> bool:
+    return "500" in error_msg or "Internal" in error_msg or "ResourceExhausted" in error_msg
+
+
+def _call_llm(prompt: str | list[str], max_output_tokens: int | None, model_name: str, stream: bool,
+              response_schema: type[BaseModel] | None = None,
+              on_chunk: Callable[[str | None], None] | None = None) -> str:
+    """
+    One uncached call. Streamed calls get gemini_llm's retry policy; a stream that fails in
+    any other way falls back to the blocking call. Whenever text already passed to
+    `on_chunk` is abandoned, `on_chunk(None)` is called first so the consumer can reset.
+    """
+    options = dict(max_output_tokens=max_output_tokens, model_name=model_name, response_schema=response_schema)
+    if not stream or DEFAULT_CANDIDATES != 1:
+        return gemini_llm(prompt, **options)
+
+    retry_delay = LLM_RETRY_DELAY
+    for attempt in range(LLM_MAX_RETRIES):
+        chunks = []
+        try:
+            for chunk in gemini_llm_stream(prompt, **options):
+                chunks.append(chunk)
+                if on_chunk is not None:
+                    on_chunk(chunk)
+            return "".join(chunks)
+        except Exception as e:
+            if chunks and on_chunk is not None:
+                on_chunk(None)
+            error_msg = str(e)
+            if not _is_retryable(error_msg):
+                _logger.warning("Streaming call failed (%s); retrying without streaming", error_msg)
+                return gemini_llm(prompt, **options)
+            if attempt == LLM_MAX_RETRIES - 1:
+                raise
+            _logger.warning("Streaming API error on attempt %d/%d: %s; retrying in %ss",
+                            attempt + 1, LLM_MAX_RETRIES, error_msg, retry_delay)
+            time.sleep(retry_delay)
+            retry_delay *= 2
+
+
+def cached_llm(prompt: str | list[str],
+               max_output_tokens: int | None = None,
+               model_name: str = DEFAULT_MODEL,
+               stream: bool = False,
+               response_schema: type[BaseModel] | None = None,
+               on_chunk: Callable[[str | None], None] | None = None) -> str:
+    """
+    `gemini_llm` with an exact-match response cache.
+
+    Only deterministic calls (temperature 0, single candidate) are cached, so a hit is
+    exactly what a fresh call would have returned. Re-evaluating the same proposal
+    therefore skips the network round-trip entirely. Empty responses are never cached.
+    With LLM_CACHE=1, misses fall through to a SQLite cache that persists across restarts.
+
+    With `stream=True` a cache miss is fetched through `gemini_llm_stream`, falling back
+    to the blocking call if the stream fails part-way. `on_chunk` is then called with each
+    streamed chunk as it arrives, and with None when the chunks seen so far are abandoned
+    (a retry or the blocking fallback follows). Cache hits return at once without calling
+    `on_chunk`.
+    """
+    if DEFAULT_TEMPERATURE != 0.0 or DEFAULT_CANDIDATES != 1:
+        return _call_llm(prompt, max_output_tokens, model_name, stream, response_schema, on_chunk)
+
+    key = _cache_key(prompt, model_name, DEFAULT_TEMPERATURE, max_output_tokens, response_schema)
+    with _response_cache_lock:
+        if key in _response_cache:
+            _cache_stats["memory_hits"] += 1
+            _response_cache.move_to_end(key)
+            return _response_cache[key]
+
+    if DISK_CACHE_ENABLED:
+        text = _disk_cache_get(key)
+        if text:
+            _remember(key, text, disk_hit=True)
+            return text
+
+    with _response_cache_lock:
+        _cache_stats["misses"] += 1
+    text = _call_llm(prompt, max_output_tokens, model_name, stream, response_schema, on_chunk)
+
+    if text:
+        _remember(key, text)
+        if DISK_CACHE_ENABLED:
+            _disk_cache_put(key, text)
+    return text
+
+
+def structured_llm(prompt: str | list[str],
+                   response_schema: type[BaseModel],
+                   max_output_tokens: int | None = None,
+                   model_name: str = DEFAULT_MODEL,
+                   stream: bool = False) -> tuple[dict | None, str]:
+    """
+    `cached_llm` constrained to `response_schema`, with the response validated against it.
+
+    A response that fails validation is dropped from the cache and the prompt is re-sent
+    with the validation error appended, at most STRUCTURED_MAX_RETRIES times.
+
+    Returns (validated dict, raw text); the dict is None if every attempt failed, so the
+    caller can still fall back to parsing the raw text itself.
+    """
+    base_parts = [prompt] if isinstance(prompt, str) else list(prompt)
+    parts = base_parts
+    text = ""
+    for attempt in range(STRUCTURED_MAX_RETRIES + 1):
+        text = cached_llm(parts, max_output_tokens, model_name, stream, response_schema)
+        try:
+            return response_schema.model_validate_json(text).model_dump(), text
+        except ValidationError as e:
+            _forget(_cache_key(parts, model_name, DEFAULT_TEMPERATURE, max_output_tokens, response_schema))
+            print(f"[WARNING] {response_schema.__name__} response failed validation "
+                  f"(attempt {attempt + 1}/{STRUCTURED_MAX_RETRIES + 1}): {e.error_count()} error(s)")
+            parts = base_parts + [
+                "\n\nYour previous response did not match the required schema:\n"
+                f"{e}\n\nReturn the complete corrected JSON object only."
+            ]
+    return None, text
+
+
+def _forget(key: str):
+    with _response_cache_lock:
+        _response_cache.pop(key, None)
+    if DISK_CACHE_ENABLED:
+        try:
+            with _disk_cache_lock:
+                conn = _disk_cache_conn()
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"[WARNING] LLM disk cache delete failed: {e}")
+
+
+def cache_stats() -> dict:
+    """Snapshot of response cache hits (memory / disk) and misses since start-up."""
+    with _response_cache_lock:
+        return dict(_cache_stats, memory_entries=len(_response_cache))
+
+
+def _remember(key: str, text: str, disk_hit: bool = False):
+    with _response_cache_lock:
+        if disk_hit:
+            _cache_stats["disk_hits"] += 1
+        _response_cache[key] = text
+        _response_cache.move_to_end(key)
+        while len(_response_cache) > RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+
+def _disk_cache_conn() -> sqlite3.Connection:
+    global _disk_cache
+    if _disk_cache is None:
+        conn = sqlite3.connect(DISK_CACHE_PATH, check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, text TEXT NOT NULL, used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used)")
+        conn.commit()
+        _disk_cache = conn
+    return _disk_cache
+
+
+def _disk_cache_get(key: str) -> str | None:
+    try:
+        with _disk_cache_lock:
+            conn = _disk_cache_conn()
+            row = conn.execute("SELECT text FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            return row[0]
+    except sqlite3.Error as e:
+        print(f"[WARNING] LLM disk cache read failed: {e}")
+        return None
+
+
+def _disk_cache_put(key: str, text: str):
+    try:
+        with _disk_cache_lock:
+            conn = _disk_cache_conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, text, used) VALUES (?, ?, ?)",
+                (key, text, time.time())
+            )
+            conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (DISK_CACHE_MAX_ROWS,)
+            )
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"[WARNING] LLM disk cache write failed: {e}")
 
 
 def set_deterministic_mode(enabled: bool = True):
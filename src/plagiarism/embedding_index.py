@@ -1,21 +1,48 @@
-import faiss
+import os
 import numpy as np
-import gc
+from .model_cache import get_st_model
 
-def _get_embedding_model():
-    """Lazy load embedding model only when needed (saves ~300MB memory)."""
-    from sentence_transformers import SentenceTransformer
-    return SentenceTransformer("all-MiniLM-L6-v2")
+# Above this many chunks, exact search gives way to an HNSW graph (sub-linear queries)
+HNSW_MIN_CHUNKS = 5000
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+# Store HNSW vectors as 8-bit scalar-quantised codes instead of float32 (4x less memory and
+# memory traffic per distance computation, at a small recall cost); opt in with
+# PLAGIARISM_INDEX_SQ8=1
+HNSW_SQ8 = os.getenv("PLAGIARISM_INDEX_SQ8", "0") == "1"
 
 def build_index(text_chunks):
-    model = _get_embedding_model()
-    try:
-        embeddings = model.encode(text_chunks, convert_to_numpy=True)
-        index = faiss.IndexFlatL2(embeddings.shape[1])
-        index.add(embeddings)
-        return index, embeddings
-    finally:
-        # Free model memory immediately after use
-        del model
-        gc.collect()
+    """
+    Index chunks for cosine-similarity search.
+
+    Embeddings are unit-normalised, so inner product equals cosine similarity and the
+    index scores are similarities (higher is closer). Large corpora use an HNSW graph;
+    tune recall with `index.hnsw.efSearch`. With HNSW_SQ8 the graph stores int8 codes
+    (trained per dimension on the corpus itself) instead of float32 vectors.
+    """
+    import faiss  # ~200 ms and OpenMP start-up; only paid when an index is built
+
+    model = get_st_model()
+    embeddings = model.encode(
+        text_chunks,
+        batch_size=64,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False
+    )
+    # FAISS only takes C-contiguous float32
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if len(embeddings) >= HNSW_MIN_CHUNKS and HNSW_SQ8:
+        index = faiss.IndexHNSWSQ(
+            embeddings.shape[1], faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(embeddings)
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif len(embeddings) >= HNSW_MIN_CHUNKS:
+        index = faiss.IndexHNSWFlat(embeddings.shape[1], HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    else:
+        index = faiss.IndexFlatIP(embeddings.shape[1])
+    index.add(embeddings)
+    return index, embeddings
 
@@ -0,0 +1,124 @@
+import gc
+import os
+import threading
+
+import numpy as np
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Dynamically quantized INT8 ONNX export shipped in the model repo, run through ONNX Runtime
+# (the avx2 variant is safe on any x86-64 CPU; "onnx/model_qint8_avx512_vnni.onnx" is faster
+# on VNNI-capable ones). Set to an empty string to use the default PyTorch backend.
+ONNX_MODEL_FILE = os.getenv("PLAGIARISM_ONNX_MODEL_FILE", "onnx/model_qint8_avx2.onnx")
+
+# Seconds without a get_st_model() call before the shared model is dropped
+IDLE_TIMEOUT_SECONDS = float(os.getenv("PLAGIARISM_MODEL_IDLE_SECONDS", "300"))
+
+# Without sentence-transformers, serve the model through the remote HF embedder (the default
+# deployment); PLAGIARISM_API_FALLBACK=0 makes a missing package an error instead
+API_FALLBACK = os.getenv("PLAGIARISM_API_FALLBACK", "1") == "1"
+
+_model = None
+_evict_timer = None
+_lock = threading.Lock()
+
+def get_st_model():
+    """
+    Shared SentenceTransformer for plagiarism detection and indexing.
+
+    Loaded lazily on first use (saves ~300MB memory until needed) and kept warm for
+    back-to-back requests. Every call restarts an idle timer; once it expires the
+    model is released so an idle server gives the memory back.
+
+    When sentence-transformers is not installed (the default deployment), the same
+    model is served through the cached API embedder from src.embeddings instead of
+    failing, so no local copy is ever loaded (see API_FALLBACK).
+    """
+    global _model
+    with _lock:
+        if _model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                if not API_FALLBACK:
+                    raise
+                from src.embeddings import get_embedder
+                print("[WARNING] sentence-transformers is not installed: plagiarism, local domain "
+                      "classification and semantic-cache embeddings go through the remote "
+                      "HuggingFace Inference API (set PLAGIARISM_API_FALLBACK=0 to disable)")
+                _model = _EmbedderModel(get_embedder())
+            else:
+                _model = _load_sentence_transformer(SentenceTransformer)
+        _schedule_eviction()
+        return _model
+
+def prewarm():
+    """
+    Import faiss and load the shared model ahead of the first plagiarism request.
+
+    Meant to run in a background thread at startup; failures only log a warning.
+    """
+    try:
+        import faiss  # noqa: F401
+    except ImportError:
+        pass
+    try:
+        get_st_model()
+        print("[INFO] Plagiarism model prewarmed")
+    except Exception as e:
+        print(f"[WARNING] Plagiarism model prewarm failed: {e}")
+
+def model_variant(model) -> str:
+    """Which weights produce `model`'s embeddings, for keying on-disk embedding caches."""
+    backend = getattr(model, "backend", "torch")
+    if backend == "onnx":
+        return f"{MODEL_NAME}:onnx:{ONNX_MODEL_FILE}"
+    return f"{MODEL_NAME}:{backend}"
+
+def _load_sentence_transformer(SentenceTransformer):
+    if ONNX_MODEL_FILE:
+        try:
+            return SentenceTransformer(
+                MODEL_NAME,
+                backend="onnx",
+                model_kwargs={"file_name": ONNX_MODEL_FILE, "provider": "CPUExecutionProvider"}
+            )
+        except Exception as e:
+            # Needs sentence-transformers >= 3.2 with optimum[onnxruntime]
+            print(f"[WARNING] INT8 ONNX model unavailable ({e}); using the PyTorch backend")
+    return SentenceTransformer(MODEL_NAME)
+
+class _EmbedderModel:
+    """SentenceTransformer-style encode() over a LangChain embedder, one request per batch."""
+
+    backend = "api"
+
+    def __init__(self, embedder):
+        self._embedder = embedder
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True,
+               normalize_embeddings=False, show_progress_bar=False):
+        sentences = list(sentences)
+        vectors = []
+        for start in range(0, len(sentences), max(1, batch_size)):
+            vectors.extend(self._embedder.embed_documents(sentences[start:start + batch_size]))
+        embeddings = np.asarray(vectors, dtype=np.float32)
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+        return embeddings
+
+def _schedule_eviction():
+    global _evict_timer
+    if _evict_timer is not None:
+        _evict_timer.cancel()
+    _evict_timer = threading.Timer(IDLE_TIMEOUT_SECONDS, _evict)
+    _evict_timer.daemon = True
+    _evict_timer.start()
+
+def _evict():
+    global _model, _evict_timer
+    with _lock:
+        _model = None
+        _evict_timer = None
+    gc.collect()
@@ -1,3 +1,16 @@
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+
+# On-disk cache of reference corpus embeddings (see load_reference_embeddings)
+REFERENCE_CACHE_DIR = Path(os.getenv("PLAGIARISM_CACHE_DIR", "cache"))
+
+# Texts per encode() call when building the cache; each slice is written straight into
+# one preallocated float32 array instead of being concatenated at the end
+REFERENCE_ENCODE_BATCH = 4096
+
 def load_reference_corpus():
     # Example lightweight seed corpus (replace with actual later)
     return [
@@ -7,3 +20,49 @@ def load_reference_corpus():
         "Climate mitigation strategies require carbon accounting models.",
         "Policy research frameworks emphasize stakeholder participation."
     ]
+
+def load_reference_embeddings(model, model_name: str, reference_texts=None):
+    """
+    Unit-normalised embeddings of the reference corpus, encoded once and cached on disk.
+
+    The cache file is keyed by a hash of the model name and the corpus contents, so
+    editing the corpus or switching models re-encodes automatically. Later calls
+    memory-map the saved array instead of running the model over the corpus again.
+    """
+    if reference_texts is None:
+        reference_texts = load_reference_corpus()
+
+    digest = hashlib.sha1(model_name.encode("utf-8"))
+    for text in reference_texts:
+        digest.update(b"\x00")
+        digest.update(text.encode("utf-8"))
+    cache_path = REFERENCE_CACHE_DIR / f"ref_embs_{digest.hexdigest()[:16]}.npy"
+
+    if cache_path.exists():
+        return np.load(cache_path, mmap_mode="r")
+
+    ref_embs = None
+    for start in range(0, len(reference_texts), REFERENCE_ENCODE_BATCH):
+        batch_embs = model.encode(
+            reference_texts[start:start + REFERENCE_ENCODE_BATCH],
+            batch_size=128,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        if ref_embs is None:
+            ref_embs = np.empty((len(reference_texts), batch_embs.shape[1]), dtype=np.float32)
+        ref_embs[start:start + len(batch_embs)] = batch_embs
+    if ref_embs is None:
+        ref_embs = np.empty((0, 0), dtype=np.float32)
+
+    try:
+        REFERENCE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Write then rename so a concurrent reader never maps a partial file
+        tmp_path = cache_path.with_name(f"{cache_path.stem}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, ref_embs)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"[WARNING] Could not cache reference embeddings at {cache_path}: {e}")
+
+    return ref_embs
@@ -1,13 +1,25 @@
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import yaml
 import os
+from functools import lru_cache
+
+# libyaml's C loader when available (much faster than the pure-Python SafeLoader)
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+@lru_cache(maxsize=8)
+def _load_config(config_path, mtime):
+    """Parse a config file once per path and modification time."""
+    with open(config_path) as f:
+        return yaml.load(f, Loader=_YamlLoader)
 
 def split_docs(docs, config_path="config.yaml"):
     if not os.path.exists(config_path):
         raise FileNotFoundError(f"{config_path} not found.")
 
-    with open(config_path) as f:
-        cfg = yaml.safe_load(f)
+    cfg = _load_config(config_path, os.path.getmtime(config_path))
 
     if cfg is None:
         raise ValueError(f"{config_path} is empty. It must contain a 'retrieval' section.")
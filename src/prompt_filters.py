@@ -0,0 +1,92 @@
+# src/prompt_filters.py
+"""
+Shrink large inputs before they are rendered into a prompt.
+
+Both filters are extractive: they only drop content, never rewrite it, so everything the
+model does see is verbatim from the proposal or an earlier agent.
+"""
+import re
+
+# Paragraphs mentioning money or a typical budget category
+_BUDGET_RE = re.compile(
+    r"\$\s*\d|\d\s*(?:usd|dollars?)\b|\b(?:dollar|cost|budget|personnel|salar|stipend|wage|fringe|"
+    r"indirect|overhead|travel|equipment|material|suppl|expense|funding|total)",
+    re.IGNORECASE,
+)
+_PARAGRAPH_SPLIT_RE = re.compile(r"\n\s*\n")
+
+# Items kept per strengths/weaknesses/issues/recommendations list for the decision prompt
+DECISION_LIST_ITEMS = 2
+
+
+def extract_budget_relevant_lines(full_text: str) -> str:
+    """
+    Keep only the paragraphs of `full_text` that mention money or a budget category.
+
+    Returns `full_text` unchanged if no paragraph matches, so the budget agent never gets
+    less than it would have without the filter.
+    """
+    paragraphs = [p for p in _PARAGRAPH_SPLIT_RE.split(full_text) if _BUDGET_RE.search(p)]
+    return "\n\n".join(paragraphs) if paragraphs else full_text
+
+
+def _top(items, limit: int = DECISION_LIST_ITEMS):
+    if not isinstance(items, list) or len(items) <= limit:
+        return items
+    return items[:limit] + [f"[... {len(items) - limit} more items omitted ...]"]
+
+
+def section_texts(summary_json):
+    """
+    The summary reduced to {section: text}, without pages, references and notes.
+
+    Later stages only reason about what each section says; the citations are for the
+    report. Values that are not in the expected shape are passed through as-is.
+    """
+    if not isinstance(summary_json, dict):
+        return summary_json
+    return {
+        section: data.get("text", "") if isinstance(data, dict) else data
+        for section, data in summary_json.items()
+    }
+
+
+def summarize_for_decision(scores_json, critique_json, budget_json, summary_json) -> dict:
+    """
+    Project the agent outputs down to what the final decision needs.
+
+    Keeps each section's score, summary and top strengths/weaknesses, the critique's
+    priorities and top issues/recommendations per lens, the budget verdict without its line
+    items, and the summary text without pages/references. Values that are not in the
+    expected shape are passed through as-is.
+    """
+    scores = scores_json.get("scores") if isinstance(scores_json, dict) else None
+    if isinstance(scores, dict):
+        scores = {
+            section: {
+                "score": data.get("score"),
+                "summary": data.get("summary", ""),
+                "strengths": _top(data.get("strengths", [])),
+                "weaknesses": _top(data.get("weaknesses", [])),
+            } if isinstance(data, dict) else data
+            for section, data in scores.items()
+        }
+    else:
+        scores = scores_json
+
+    if isinstance(critique_json, dict):
+        critique = {
+            name: {"issues": _top(value.get("issues", [])),
+                   "recommendations": _top(value.get("recommendations", []))}
+            if isinstance(value, dict) else value
+            for name, value in critique_json.items()
+        }
+    else:
+        critique = critique_json
+
+    if isinstance(budget_json, dict):
+        budget = {key: budget_json[key] for key in ("totalBudget", "flags", "summary") if key in budget_json}
+    else:
+        budget = budget_json
+
+    return {"scores": scores, "critique": critique, "budget": budget, "summary": section_texts(summary_json)}
@@ -1,47 +1,41 @@
-from langchain.prompts import PromptTemplate
-
-# src/prompts.py
-
 # src/prompts.py
-
-# SUMMARY_PROMPT = """
-# You are an expert grant reviewer. Summarize the following grant proposal strictly in JSON.
-# Include the following sections: Objectives, Methodology, ExpectedOutcomes, Innovation, Feasibility.
-
-# Each section should contain:
-# - "text": concise summary of that section
-# - "pages": list of page numbers where the information appears
-# - "references": include page numbers and sources for cited information
-# - "notes": brief commentary or confidence about the information
-
-# The input text has page numbers and sources in this format: [Page X | Source: filename.pdf]
-
-# Context:
-# {context}
-
-# Return **only valid JSON**, no extra text.
-# """
-
-SUMMARY_PROMPT = """
-You are an expert grant reviewer specializing in the field of **{domain}**.
+import hashlib
+import json
+import re
+from functools import lru_cache
+from src.config.domain_rubrics import DOMAIN_RUBRICS, domain_rubric
+from src.config.domains import DOMAINS
+
+# Labels each summary section may appear under in a proposal; embedded once in
+# SUMMARY_PROMPT_PREFIX as compact JSON instead of being repeated in prose per section
+_SECTION_ALIASES = {
+    "CoverLetter": ["Cover Letter", "Introduction", "Letter of Intent"],
+    "Objectives": ["Objectives", "Goals", "Aims", "Project Objectives", "Purpose"],
+    "Methodology": ["Methodology", "Methods", "Approach", "Project Description", "Activities", "Implementation Plan"],
+    "EvaluationPlan": ["Evaluation", "Evaluation Plan", "Assessment", "Monitoring", "Success Metrics"],
+    "ExpectedOutcomes": ["Expected Outcomes", "Outcomes", "Expected Results", "Impact", "Deliverables"],
+    "Budget": ["Budget", "Budget Narrative", "Costs", "Financial Plan"],
+    "Feasibility": ["Feasibility", "Sustainability", "Future Funding", "Organizational Capacity", "Resources"],
+    "Innovation": ["Innovation", "Innovative Approach", "Novel Aspects", "Unique Features"],
+    "Sustainability": ["Sustainability", "Future Plans", "Long-term Sustainability", "Continuation Plan"],
+    "LettersOfSupport": ["Letters of Support", "Endorsements", "Partner Letters", "Appendices"],
+}
+
+# Static instructions. Sent byte-identical on every call (as the first content part)
+# so the provider can reuse the cached prefix; per-call values live in the SUFFIX.
+SUMMARY_PROMPT_PREFIX = """
+You are an expert grant reviewer specializing in the research field given under "Domain" at the end of this prompt.
 
 Your task is to summarize the following grant proposal into a structured JSON format.
 The summary must capture the meaning, intent, and emphasis of the proposal accurately,
-using terminology appropriate for the **{domain}** research area.
+using terminology appropriate for that research area.
 
 ### CRITICAL RULES:
 - **IMPORTANT: Some proposals may not have explicitly labeled sections. Extract the CONTENT even if section headers are different or missing.**
-- **Look for concepts, not just section titles.** For example:
-  - "Expected Outcomes" may be in "Objectives", "Goals", "Impact", or "Results" sections
-  - "Innovation" may be described in "Project Description", "Approach", or "Methodology"
-  - "Feasibility" may be in "Sustainability", "Future Funding", "Resources", or "Capacity"
-- **FALLBACK EXTRACTION STRATEGY:** If you cannot find a dedicated section:
+- **Look for concepts, not just section titles.** If you cannot find a dedicated section:
   1. **Search the entire proposal** for relevant content about that concept
   2. **Infer and extract** information scattered across multiple sections
   3. **Synthesize** a coherent summary from what you find
-  4. **For Innovation specifically:** Look for novel approaches, unique methods, new technologies, creative solutions, or what makes this project different from existing work
-  5. **For Feasibility:** Look for organizational capacity, past success, resources, partnerships, timeline realism, or continuation plans
-  6. **For Expected Outcomes:** Look for quantifiable goals, measurable targets, success metrics, or anticipated results
 - **Only if information is completely absent** (not just unlabeled), state:
   - "text": "Not provided"
   - "pages": []
@@ -49,28 +43,19 @@ using terminology appropriate for the **{domain}** research area.
   - "notes": "Section missing or insufficiently described."
 - You must base the summary **on the provided text**, but you may **infer and synthesize** when content is present but not explicitly labeled.
 
-Include all of the following sections (even if the original document uses different names):
-- **CoverLetter** (may be labeled: "Cover Letter", "Introduction", opening letter)
-- **Objectives** (may be labeled: "Goals", "Purpose", "Aims", "Project Objectives")
-- **Methodology** (may be labeled: "Methods", "Approach", "Project Description", "Activities", "Implementation Plan")
-- **EvaluationPlan** (may be labeled: "Evaluation", "Assessment", "Monitoring", "Success Metrics")
-- **ExpectedOutcomes** (may be labeled: "Outcomes", "Expected Results", "Impact", "Deliverables" - often embedded in Objectives section)
-- **Budget** (may be labeled: "Budget", "Budget Narrative", "Costs", "Financial Plan")
-- **Feasibility** (may be labeled: "Sustainability", "Future Funding", "Organizational Capacity", "Resources", "Long-term Plans")
-- **Innovation** (may be labeled: "Innovative Approach", "Novel Aspects", "Unique Features" - often embedded in Methodology or Project Description)
-- **Sustainability** (may be labeled: "Future Plans", "Long-term Sustainability", "Continuation Plan")
-- **LettersOfSupport** (may be labeled: "Letters of Support", "Endorsements", "Partner Letters")
+Include all of the following sections, even if the original document uses different names.
+Section aliases (JSON, section: labels to search for first; the guidelines below say where else to look):
+""" + json.dumps(_SECTION_ALIASES) + """
 
 ### For each section, include:
 - "text": A clear, detailed summary capturing specific actions, strategies, stakeholders, or workflows.
 - "pages": List of page numbers where relevant information appears.
-- "references": Exact short quotes or key phrases from the proposal to support the summary. **Format each reference as: "[Page X] Quote text" or "[Page X, approx. line Y] Quote text" when possible.**
-- "notes": Expert commentary on completeness, clarity, relevance, or missing details.
+- "references": Up to 5 exact short quotes or key phrases from the proposal to support the summary. **Format each reference as: "[Page X] Quote text" or "[Page X, approx. line Y] Quote text" when possible**, taking X from the [Page X | Source: filename.pdf] markers in the input text.
+- "notes": One short sentence on what is missing or unclear, or "" if the section is complete. Do not restate "text".
 
 ### SPECIAL EXTRACTION GUIDELINES:
 
 **For ExpectedOutcomes:**
-- **PRIMARY SEARCH:** Look for sections labeled "Expected Outcomes", "Outcomes", "Expected Results", "Impact", "Deliverables"
 - **SECONDARY SEARCH:** If no dedicated outcomes section, extract from:
   - Objectives section (often contains outcome statements)
   - Goals section (quantifiable targets)
@@ -86,7 +71,6 @@ Include all of the following sections (even if the original document uses differ
 - May overlap with Objectives - that's OK, extract the outcome-focused content
 
 **For Innovation:**
-- **PRIMARY SEARCH:** Look for sections labeled "Innovation", "Innovative Approach", "Novel Aspects", "Unique Features"
 - **SECONDARY SEARCH:** If no dedicated innovation section exists, search throughout the proposal for:
   - Novel or unique methodologies, approaches, or techniques
   - New technologies, tools, or equipment being introduced
@@ -106,7 +90,6 @@ Include all of the following sections (even if the original document uses differ
   - Include this in "notes" rather than leaving it as "Not provided"
 
 **For Feasibility:**
-- **PRIMARY SEARCH:** Look for sections labeled "Feasibility", "Sustainability", "Future Funding", "Organizational Capacity", "Resources"
 - **SECONDARY SEARCH:** If no dedicated feasibility section, extract from:
   - Sustainability or continuation plans
   - Future funding commitments
@@ -126,7 +109,6 @@ Include all of the following sections (even if the original document uses differ
 - Include any commitments from stakeholders or funding bodies for continuation
 
 **For CoverLetter:**
-- **PRIMARY SEARCH:** Look for sections labeled "Cover Letter", "Introduction", "Letter of Intent"
 - **SECONDARY SEARCH:** If no dedicated cover letter, look for:
   - Opening statement or introduction
   - Initial paragraphs that introduce the organization and project
@@ -139,7 +121,6 @@ Include all of the following sections (even if the original document uses differ
 - **INFERENCE ALLOWED:** Extract introductory content even if not formally labeled as cover letter
 
 **For Objectives:**
-- **PRIMARY SEARCH:** Look for sections labeled "Objectives", "Goals", "Aims", "Project Objectives", "Purpose"
 - **SECONDARY SEARCH:** If no dedicated objectives section, extract from:
   - Summary or introduction (often states main goals)
   - Problem statement (goals are often stated as solutions)
@@ -152,7 +133,6 @@ Include all of the following sections (even if the original document uses differ
 - **INFERENCE ALLOWED:** Extract goal statements from throughout the proposal
 
 **For Methodology:**
-- **PRIMARY SEARCH:** Look for sections labeled "Methodology", "Methods", "Approach", "Project Description", "Activities", "Implementation Plan"
 - **SECONDARY SEARCH:** If no dedicated methodology section, extract from:
   - Project description or narrative
   - Work plan or timeline sections
@@ -166,7 +146,6 @@ Include all of the following sections (even if the original document uses differ
 - **INFERENCE ALLOWED:** Synthesize methodology from scattered activity descriptions
 
 **For EvaluationPlan:**
-- **PRIMARY SEARCH:** Look for sections labeled "Evaluation", "Evaluation Plan", "Assessment", "Monitoring", "Success Metrics"
 - **SECONDARY SEARCH:** If no dedicated evaluation section, look for:
   - Measurement strategies mentioned in objectives
   - Success indicators or metrics
@@ -181,7 +160,6 @@ Include all of the following sections (even if the original document uses differ
 - **INFERENCE ALLOWED:** Extract evaluation-related content from objectives, methodology, or outcomes sections
 
 **For Sustainability:**
-- **PRIMARY SEARCH:** Look for sections labeled "Sustainability", "Future Plans", "Long-term Sustainability", "Continuation Plan"
 - **SECONDARY SEARCH:** If no dedicated sustainability section, extract from:
   - Future funding section
   - Organizational capacity descriptions
@@ -194,7 +172,6 @@ Include all of the following sections (even if the original document uses differ
 - **INFERENCE ALLOWED:** Synthesize sustainability from future funding and capacity statements
 
 **For LettersOfSupport:**
-- **PRIMARY SEARCH:** Look for sections labeled "Letters of Support", "Endorsements", "Partner Letters", "Appendices"
 - **SECONDARY SEARCH:** If no dedicated letters section, look for:
   - Partnership descriptions
   - Stakeholder commitments
@@ -207,7 +184,6 @@ Include all of the following sections (even if the original document uses differ
 - **INFERENCE ALLOWED:** Note mentions of partner support even if formal letters aren't included
 
 ### SPECIAL INSTRUCTIONS FOR BUDGET SECTION:
-- **PRIMARY SEARCH:** Look for sections labeled "Budget", "Budget Narrative", "Costs", "Financial Plan"
 - **SECONDARY SEARCH:** If no dedicated budget section, search for:
   - Dollar amounts and cost figures anywhere in the proposal
   - Resource requirements
@@ -218,33 +194,28 @@ Include all of the following sections (even if the original document uses differ
 - Copy exact dollar figures (e.g., "$50,000 for personnel", "$10,000 for equipment")
 - List ALL budget categories mentioned with their specific amounts
 - In the "text" field, provide a detailed itemized breakdown with actual numbers
-- In "references", include direct quotes with dollar amounts **formatted as: "[Page X] Quote with dollar amount"**
+- In "references", include direct quotes with dollar amounts
 - **INFERENCE ALLOWED:** Compile budget information from scattered cost mentions throughout the proposal
 
-If the proposal does not contain enough information for a section, explicitly state:
-- text: "Not provided"
-- pages: []
-- references: []
-- notes: "Section missing or insufficiently described."
+### Output:
+Return **only valid JSON**, with no explanation or surrounding text.
+"""
 
-The input text includes page markers in the format:
-[Page X | Source: filename.pdf]
+SUMMARY_PROMPT_SUFFIX = """
+### Domain:
+{domain}
 
-**IMPORTANT:** When creating references, extract the page number from these markers and format your references as:
-- "[Page X] Direct quote from the proposal"
-- This helps reviewers quickly locate and verify the quoted content
+### Domain-specific guidance:
+{domain_rubric}
 
 ### Input Proposal Text:
 {context}
-
-### Output:
-Return **only valid JSON**, with no explanation or surrounding text.
 """
 
 
-# Scoring prompt template
-SCORING_PROMPT = """
-You are an expert grant evaluator specializing in the field of **{domain}**.
+# Scoring prompt: static PREFIX (instructions) and per-call SUFFIX (output shape + input)
+SCORING_PROMPT_PREFIX = """
+You are an expert grant evaluator specializing in the research field given under "Domain" at the end of this prompt.
 You are given a structured summary of a grant proposal in JSON format.
 
 Your task is to evaluate the quality of each section objectively and produce **strictly structured JSON output** suitable for automated scoring.
@@ -252,7 +223,6 @@ Your task is to evaluate the quality of each section objectively and produce **s
 ### CRITICAL RULES:
 - **Do NOT invent or assume any information that is not clearly present in the summary.**
 - **Do NOT adjust or compute the final overall weighted score.** The scoring engine handles weighting.
-- Return **only valid JSON** exactly in the requested structure.
 - **IMPORTANT: You MUST complete the entire JSON response. Do not truncate strings or leave objects incomplete.**
 - Keep strengths and weaknesses concise (under 100 characters each) to ensure completion.
 
@@ -266,112 +236,61 @@ Your task is to evaluate the quality of each section objectively and produce **s
 - If a section contains substantive content (regardless of origin), score it based on that content's quality.
 
 ### SCORING INSTRUCTIONS
-1. **Rate each section from 0 to 10**
-   - 0 = Missing or irrelevant
-   - 5 = Acceptable but incomplete or vague
-   - 10 = Exceptional, clear, and well-supported
+1. **Rate each section as an integer from 0 to 10** using this rubric:
+   10 = Exceptional, no major weaknesses | 8–9 = Strong, minor refinements needed | 6–7 = Adequate, lacks clarity or justification | 4–5 = Weak, substantial details missing | 0–3 = Critically flawed, incomplete or non-compliant
 
 2. **Be strict but fair.**
    - Penalize missing data, weak justification, vague language, or lack of evidence.
-   - Reward specificity, measurable goals, methodological rigor, innovation appropriate to the **{domain}** field, and clear alignment between goals and execution plan.
+   - Reward specificity, measurable goals, methodological rigor, innovation appropriate to that field, and clear alignment between goals and execution plan.
 
 3. **Provide concise reasoning in each section’s fields:**
    - `summary`: One clear sentence describing the section's effectiveness.
    - `strengths`: 1–3 bullet points.
    - `weaknesses`: 1–3 bullet points.
-   - `score`: Integer 0–10 (no decimals).
+"""
+
+SCORING_PROMPT_SUFFIX = """
+4. Provide `overall_summary` (1 short paragraph) describing general quality and coherence across sections.
+
+### OUTPUT FORMAT
+Return JSON matching the provided response schema: one entry per section under "scores", plus "overall_summary".
+
+### Domain:
+{domain}
 
-4. **Do NOT compute an overall weighted score here.**
-   - The final weighted score is computed separately by the evaluation engine.
-   - You must still provide `overall_summary` (1 short paragraph) describing general quality and coherence across sections.
+### Domain-specific guidance:
+{domain_rubric}
 
 ### INPUT
 Input JSON (the structured proposal summary):
 {grant_json}
+"""
+
+# Per-section variant of the scoring SUFFIX; shares SCORING_PROMPT_PREFIX, which says
+# nothing about the output shape (that is left to each SUFFIX)
+SECTION_SCORING_PROMPT_SUFFIX = """
+### OUTPUT FORMAT
+Score ONLY the section "{section_name}" and return a single entry for it, matching the provided response schema.
 
-### OUTPUT FORMAT (STRICTLY JSON)
-{{
-  "scores": {{
-    "CoverLetter": {{
-      "score": int,
-      "summary": str,
-      "strengths": [str, ...],
-      "weaknesses": [str, ...]
-    }},
-    "Objectives": {{
-      "score": int,
-      "summary": str,
-      "strengths": [str, ...],
-      "weaknesses": [str, ...]
-    }},
-    "Methodology": {{
-      "score": int,
-      "summary": str,
-      "strengths": [str, ...],
-      "weaknesses": [str, ...]
-    }},
-    "EvaluationPlan": {{
-      "score": int,
-      "summary": str,
-      "strengths": [str, ...],
-      "weaknesses": [str, ...]
-    }},
-    "ExpectedOutcomes": {{
-      "score": int,
-      "summary": str,
-      "strengths": [str, ...],
-      "weaknesses": [str, ...]
-    }},
-    "Budget": {{
-      "score": int,
-      "summary": str,
-      "strengths": [str, ...],
-      "weaknesses": [str, ...]
-    }},
-    "Feasibility": {{
-      "score": int,
-      "summary": str,
-      "strengths": [str, ...],
-      "weaknesses": [str, ...]
-    }},
-    "Innovation": {{
-      "score": int,
-      "summary": str,
-      "strengths": [str, ...],
-      "weaknesses": [str, ...]
-    }},
-    "Sustainability": {{
-      "score": int,
-      "summary": str,
-      "strengths": [str, ...],
-      "weaknesses": [str, ...]
-    }},
-    "LettersOfSupport": {{
-      "score": int,
-      "summary": str,
-      "strengths": [str, ...],
-      "weaknesses": [str, ...]
-    }}
-  }},
-  "overall_summary": str
-}}
-
-Scoring Guidance:
-- 10 = Exceptional and field-appropriate excellence (no major weaknesses)
-- 8–9 = Strong but with minor refinements needed
-- 6–7 = Adequate but lacks clarity or justification
-- 4–5 = Weak with substantial missing details
-- 0–3 = Critically flawed, incomplete, or non-compliant
+### Domain:
+{domain}
 
+### Domain-specific guidance:
+{domain_rubric}
+
+### INPUT
+Input JSON (this section of the structured proposal summary):
+{section_json}
 """
-MASTER_CRITIQUE_PROMPT = """
-You are a master-level grant reviewer specializing in the field of **{domain}**.
+# Critique prompt: static PREFIX (instructions + schema) and per-call SUFFIX
+MASTER_CRITIQUE_PROMPT_PREFIX = """
+You are a master-level grant reviewer specializing in the research field given under "Domain" at the end of this prompt.
 
 You are provided with:
 1. The structured summaries of each proposal section (optional, may be None).
 2. The section-level evaluation results from the Scoring Agent (scores, strengths, and weaknesses).
 
-Your role is to produce a clear, objective critique that contextualizes the evaluation **according to the standards and expectations of the {domain} field**.
+Your role is to produce a clear, objective critique that contextualizes the evaluation **according to the standards and expectations of that field**.
 
 ### Review Domains (analyze each):
 1. **Scientific Rigor** – methodological soundness, research grounding, field-specific validity.
@@ -380,7 +299,7 @@ Your role is to produce a clear, objective critique that contextualizes the eval
 4. **Context & Alignment** – alignment between goals, execution strategy, and expected outcomes.
 5. **Persuasiveness** – justification strength, credibility, compelling rationale.
 6. **Ethics & Inclusivity** – transparency, fairness, participant considerations, responsible conduct.
-7. **Innovation & Impact** – originality, transformative potential, significance in the **{domain}** context.
+7. **Innovation & Impact** – originality, transformative potential, significance in the context of that field.
 
 ### Important Instructions:
 - Do **NOT** re-score or modify any scores.
@@ -391,92 +310,47 @@ Your role is to produce a clear, objective critique that contextualizes the eval
 For each review domain, produce:
 - 2–5 **issues** — specific shortcomings or concerns
 - 2–5 **recommendations** — realistic, actionable improvements
-- Be factual, professional, concise.
 
 End with:
 - `priority_focus`: The **three most important** areas to improve first.
 - `overall_feedback`: One concise paragraph synthesizing overall quality and improvement direction.
 
+### OUTPUT:
+Return JSON matching the provided response schema.
+"""
+
+MASTER_CRITIQUE_PROMPT_SUFFIX = """
+### Domain:
+{domain}
+
+### Domain-specific guidance:
+{domain_rubric}
+
 ### INPUT (JSON):
 {input_json}
-
-### OUTPUT (STRICT JSON ONLY):
-{{
-  "scientific_critique": {{
-    "issues": [str, ...],
-    "recommendations": [str, ...]
-  }},
-  "practical_critique": {{
-    "issues": [str, ...],
-    "recommendations": [str, ...]
-  }},
-  "language_critique": {{
-    "issues": [str, ...],
-    "recommendations": [str, ...]
-  }},
-  "context_critique": {{
-    "issues": [str, ...],
-    "recommendations": [str, ...]
-  }},
-  "persuasiveness_critique": {{
-    "issues": [str, ...],
-    "recommendations": [str, ...]
-  }},
-  "ethical_critique": {{
-    "issues": [str, ...],
-    "recommendations": [str, ...]
-  }},
-  "innovation_critique": {{
-    "issues": [str, ...],
-    "recommendations": [str, ...]
-  }},
-  "priority_focus": [str, ...],
-  "overall_feedback": str
-}}
 """
 
 
 
-FINAL_DECISION_PROMPT = """
-You are an expert grant reviewer making a final funding decision for a proposal in the field of **{domain}**.
+# Final decision prompt: static PREFIX (task + style) and per-call SUFFIX. The decision itself
+# is made in code from the final weighted score (see config/decision_thresholds.decide); the model only
+# writes the justification.
+FINAL_DECISION_PROMPT_PREFIX = """
+You are an expert grant reviewer writing the justification for a funding decision on a proposal in the research field given under "Domain" at the end of this prompt.
+
+The decision and the final weighted score are given under "Decision" and "Final Weighted Score" at the end of this prompt. Both are final.
 
-You are provided the following:
+You are provided the following (under "INPUT DATA" at the end of this prompt):
 - Structured summary of the proposal
 - Section-level scores and evaluations
 - Budget evaluation results
 - Critique analysis
-- And the **final weighted score**, already calculated by the evaluation engine: {final_weighted_score}
-
-### INPUT DATA:
-{data}
-
-### IMPORTANT:
-- **DO NOT** recalculate or change the score.
-- **DO NOT** average, reinterpret, or modify section scores.
-- Use `final_weighted_score` ({final_weighted_score}) exactly as given.
-
-### DECISION RULES (STRICT):
-- If final_weighted_score ≥ 8.0 → **ACCEPT**
-- If 6.0 ≤ final_weighted_score < 8.0 → **CONDITIONALLY ACCEPT**
-- If final_weighted_score < 6.0 → **REJECT**
 
 ### Your Task:
-Write a professional, concise justification referencing meaningful strengths and weaknesses.
-
-### OUTPUT FORMAT (STRICT JSON):
-{{
-  "final_score": {final_weighted_score},
-  "decision": "ACCEPT" | "CONDITIONALLY ACCEPT" | "REJECT",
-  "rationale": "Short paragraph explaining the decision.",
-  "key_strengths": [str, ...],
-  "key_weaknesses": [str, ...],
-  "next_steps": "One clear recommendation for improvement."
-}}
-
-### Output Rules:
-- Return **only the JSON object**.
-- **Do not include backticks or code fences.**
-- Do not reference the scoring process or internal prompts.
+Write a professional, concise justification of the given decision referencing meaningful strengths and weaknesses.
+
+### OUTPUT FORMAT:
+Return JSON matching the provided response schema.
 
 ### STYLE:
 - Be objective and analytical.
@@ -484,41 +358,45 @@ Write a professional, concise justification referencing meaningful strengths and
 - Do not reference the scoring process or internal instructions.
 """
 
+FINAL_DECISION_PROMPT_SUFFIX = """
+### Domain:
+{domain}
+
+### Decision:
+{decision}
 
+### Final Weighted Score:
+{final_weighted_score}
 
-DOMAIN_CLASSIFIER_PROMPT = """
+### INPUT DATA:
+{data}
+"""
+
+
+
+# Domain classifier prompt: static PREFIX (labels + rules) and per-call SUFFIX (proposal text)
+DOMAIN_CLASSIFIER_PROMPT_PREFIX = """
 You are a research grant proposal domain classifier.
 
-Your task is to examine the proposal text and determine **the single most appropriate research domain**.
+Your task is to examine the proposal text (under "Proposal Text" at the end of this prompt) and determine **the single most appropriate research domain**.
 
 Possible domains — choose **exactly one**:
-- AI / Computer Science
-- Biotechnology / Life Sciences
-- Healthcare / Medicine
-- Education / Learning Sciences
-- Environment / Climate / Sustainability
-- Social Sciences / Policy
-- Agriculture / Food Systems
-
-Rules:
-- Return **only the domain name** EXACTLY as written above.
-- Do **not** explain.
-- Do **not** add text.
+""" + "\n".join(f"- {domain}" for domain in DOMAINS) + """
 
+Return only the domain name, exactly as written above.
+"""
+
+DOMAIN_CLASSIFIER_PROMPT_SUFFIX = """
 Proposal Text:
 {context}
 """
 
 
-BUDGET_PROMPT = """
-You are an expert budget analyst specializing in **{domain}** research grants.
-
-Analyze the following budget information from a grant proposal and provide a comprehensive evaluation.
+# Budget prompt: static PREFIX (instructions + schema) and per-call SUFFIX
+BUDGET_PROMPT_PREFIX = """
+You are an expert budget analyst specializing in research grants in the field given under "Domain" at the end of this prompt.
 
-### Budget Information:
-{budget_json}
-
-### Maximum Allowed Budget: ${max_budget}
+Analyze the budget information from a grant proposal (under "Budget Information" at the end of this prompt) and provide a comprehensive evaluation.
 
 ### CRITICAL INSTRUCTIONS:
 1. **THOROUGHLY SCAN** the provided text for ALL budget-related information:
@@ -549,11 +427,6 @@ Analyze the following budget information from a grant proposal and provide a com
    - If percentages are given with a total, calculate the dollar amounts
    - If ranges are given (e.g., "$10K-$15K"), use the midpoint
 
-5. **ALL NUMERIC OUTPUTS**:
-   - amount and percentage MUST be numbers (float or int), NEVER strings
-   - Format: 5000.0 (not "5000" or "Unclear" or "TBD")
-   - Calculate percentages from total budget
-
 ### Your Analysis Must Include:
 
 1. **Budget Breakdown Extraction**:
@@ -565,11 +438,11 @@ Analyze the following budget information from a grant proposal and provide a com
 2. **Cost-Effectiveness Analysis**:
    - Assess if the budget is appropriate for the proposed work
    - Identify potential over-budgeting or under-budgeting
-   - Compare against typical {domain} project costs
+   - Compare against typical project costs in that field
 
 3. **Compliance Check**:
-   - Verify if total budget is within the maximum allowed (${max_budget})
-   - Check for required budget categories for {domain} research
+   - Verify if total budget is within the Maximum Allowed Budget given at the end of this prompt
+   - Check for required budget categories for research in that field
    - Flag any budget items that seem inappropriate or missing
 
 4. **Risk Assessment**:
@@ -577,28 +450,21 @@ Analyze the following budget information from a grant proposal and provide a com
    - Flag any red flags or concerns
    - Suggest budget optimizations if needed
 
-### Output Format (STRICT JSON - all amounts MUST be numbers):
-{{
-  "totalBudget": <number_only>,
-  "breakdown": [
-    {{"category": "<name>", "amount": <number_only>, "percentage": <number_only>}}
-  ],
-  "flags": [
-    {{"type": "warning|error|info", "message": "<description>"}}
-  ],
-  "summary": "<overall assessment including what was found and calculated>"
-}}
-
-### EXAMPLES OF GOOD EXTRACTION:
-- Text: "Personnel: $100,000" → {{"category": "Personnel", "amount": 100000.0, "percentage": 66.7}}
-- Text: "Travel budget is $15K" → {{"category": "Travel", "amount": 15000.0, "percentage": 10.0}}
-- Text: "Two postdocs at $50,000 each" → {{"category": "Personnel", "amount": 100000.0, "percentage": 66.7}}
-
-IMPORTANT: 
-- Scan the ENTIRE text for budget information, not just the first section
-- Extract from tables, narratives, and scattered mentions
-- Calculate totals even if not explicitly stated
-- Return **only valid JSON**, no additional text.
+### Output Format:
+Return JSON matching the provided response schema (all amounts are numbers).
+"""
+
+BUDGET_PROMPT_SUFFIX = """
+### Domain:
+{domain}
+
+### Domain-specific guidance:
+{domain_rubric}
+
+### Maximum Allowed Budget: ${max_budget}
+
+### Budget Information:
+{budget_json}
 """
 
 
@@ -613,3 +479,100 @@ Constraints:
 Inputs:
 {all_results}
 """
+
+
+# Every template that is filled in per call, by name; render() is the single entry point
+_TEMPLATES = {
+    "summary": SUMMARY_PROMPT_SUFFIX,
+    "scoring": SCORING_PROMPT_SUFFIX,
+    "section_scoring": SECTION_SCORING_PROMPT_SUFFIX,
+    "critique": MASTER_CRITIQUE_PROMPT_SUFFIX,
+    "final_decision": FINAL_DECISION_PROMPT_SUFFIX,
+    "budget": BUDGET_PROMPT_SUFFIX,
+    "domain_classifier": DOMAIN_CLASSIFIER_PROMPT_SUFFIX,
+    "pdf_format": PDF_FORMAT_PROMPT,
+}
+
+# Static part sent ahead of each per-call template (see prompt_parts)
+_PREFIXES = {
+    "summary": SUMMARY_PROMPT_PREFIX,
+    "scoring": SCORING_PROMPT_PREFIX,
+    "section_scoring": SCORING_PROMPT_PREFIX,
+    "critique": MASTER_CRITIQUE_PROMPT_PREFIX,
+    "final_decision": FINAL_DECISION_PROMPT_PREFIX,
+    "budget": BUDGET_PROMPT_PREFIX,
+    "domain_classifier": DOMAIN_CLASSIFIER_PROMPT_PREFIX,
+}
+
+
+# Changes whenever any prompt text changes; part of cache scopes that outlive a deploy
+PROMPT_VERSION = hashlib.sha256(
+    "\x00".join(list(_PREFIXES.values()) + list(_TEMPLATES.values())).encode("utf-8")
+).hexdigest()[:16]
+
+
+_FIELD_RE = re.compile(r"\{(\w+)\}")
+
+
+def _compile(template: str) -> tuple[list[str], list[str]]:
+    """Split a str.format-style template into its literal text and field names, once."""
+    parts = _FIELD_RE.split(template.replace("{{", "\x00").replace("}}", "\x01"))
+    literals = [part.replace("\x00", "{").replace("\x01", "}") for part in parts[::2]]
+    return literals, parts[1::2]
+
+
+# Precompiled at import, so rendering is a single join instead of a brace scan per call
+_COMPILED_TEMPLATES = {name: _compile(template) for name, template in _TEMPLATES.items()}
+
+
+@lru_cache(maxsize=256)
+def _specialize(name: str, domain: str) -> tuple[list[str], list[str]]:
+    """
+    The compiled template `name` with `domain` (and its rubric) folded into the literals,
+    leaving only the per-call fields to fill.
+    """
+    literals, fields = _COMPILED_TEMPLATES[name]
+    known = {"domain": domain, "domain_rubric": domain_rubric(domain)}
+    out_literals, out_fields = [literals[0]], []
+    for field, literal in zip(fields, literals[1:]):
+        if field in known:
+            out_literals[-1] += known[field] + literal
+        else:
+            out_fields.append(field)
+            out_literals.append(literal)
+    return out_literals, out_fields
+
+
+# Every (template, known domain) pair is specialised at import; other domains on first use
+for _name, (_, _fields) in _COMPILED_TEMPLATES.items():
+    if "domain" in _fields:
+        for _domain in DOMAIN_RUBRICS:
+            _specialize(_name, _domain)
+
+
+def render(name: str, **bindings) -> str:
+    """
+    Fill in the per-call template `name`.
+
+    Templates with a `{domain}` field are rendered from their per-domain specialisation,
+    which also supplies `{domain_rubric}`. Only the static parts are cached: the bindings
+    carry whole proposals, so caching rendered strings would hash and pin them for nothing.
+    """
+    literals, fields = _COMPILED_TEMPLATES[name]
+    if "domain" in fields:
+        literals, fields = _specialize(name, str(bindings["domain"]))
+    out = [literals[0]]
+    for field, literal in zip(fields, literals[1:]):
+        out.append(str(bindings[field]))
+        out.append(literal)
+    return "".join(out)
+
+
+def prompt_parts(name: str, **bindings) -> list[str]:
+    """
+    Build the multi-part prompt for `name`: [static prefix, rendered per-call suffix].
+
+    The prefix is the same str object on every call and is never copied into the
+    (potentially large) per-call text, so it stays byte-identical for prefix caching.
+    """
+    return [_PREFIXES[name], render(name, **bindings)]
@@ -0,0 +1,101 @@
+# src/schemas.py
+"""
+Response schemas for the structured-output agents.
+
+Each model is passed to Gemini as `response_schema`, so the output format is enforced by
+the API instead of being spelled out in the prompt, and is used again to validate the
+response (see `structured_llm`). Fields have no defaults: Gemini's schema format does not
+accept them, and every field is required output. Enums constrain a plain-text answer to
+one of their values instead (see `_build_model`).
+"""
+import re
+from collections import Counter
+from enum import Enum
+from typing import Literal, get_args
+from pydantic import BaseModel, Field, model_validator
+from src.config.domains import DOMAINS
+
+
+ScoredSection = Literal[
+    "CoverLetter", "Objectives", "Methodology", "EvaluationPlan", "ExpectedOutcomes",
+    "Budget", "Feasibility", "Innovation", "Sustainability", "LettersOfSupport",
+]
+
+
+class SectionScore(BaseModel):
+    section: ScoredSection
+    score: int = Field(description="Integer score from 0 to 10")
+    summary: str
+    strengths: list[str]
+    weaknesses: list[str]
+
+
+class ScoringOutput(BaseModel):
+    # One record per section; run_grant_scoring pivots this back into {section: {...}}
+    scores: list[SectionScore] = Field(description="One entry per section")
+    overall_summary: str
+
+    @model_validator(mode="after")
+    def _every_section_once(self):
+        # The list shape cannot express "each section exactly once" in the schema itself;
+        # a violation fails validation, so structured_llm re-prompts instead of passing on
+        # a map with missing (or silently overwritten) sections
+        counts = Counter(entry.section for entry in self.scores)
+        missing = [section for section in get_args(ScoredSection) if section not in counts]
+        repeated = [section for section, count in counts.items() if count > 1]
+        if missing or repeated:
+            raise ValueError(f"scores must contain each section exactly once; "
+                             f"missing: {missing or 'none'}, repeated: {repeated or 'none'}")
+        return self
+
+
+class CritiqueLens(BaseModel):
+    issues: list[str]
+    recommendations: list[str]
+
+
+class CritiqueOutput(BaseModel):
+    scientific_critique: CritiqueLens
+    practical_critique: CritiqueLens
+    language_critique: CritiqueLens
+    context_critique: CritiqueLens
+    persuasiveness_critique: CritiqueLens
+    ethical_critique: CritiqueLens
+    innovation_critique: CritiqueLens
+    priority_focus: list[str] = Field(description="The three most important areas to improve first")
+    overall_feedback: str
+
+
+# The labels offered by DOMAIN_CLASSIFIER_PROMPT_PREFIX, i.e. every entry of DOMAINS
+ClassifierDomain = Enum(
+    "ClassifierDomain",
+    {re.sub(r"\W+", "_", domain).strip("_").upper(): domain for domain in DOMAINS},
+    type=str,
+    module=__name__,
+)
+
+
+class DecisionNarrative(BaseModel):
+    # The decision and final score are filled in by code (config/decision_thresholds.decide)
+    rationale: str = Field(description="Short paragraph explaining the decision")
+    key_strengths: list[str]
+    key_weaknesses: list[str]
+    next_steps: str = Field(description="One clear recommendation for improvement")
+
+
+class BudgetLine(BaseModel):
+    category: str
+    amount: float
+    percentage: float
+
+
+class BudgetFlag(BaseModel):
+    type: Literal["warning", "error", "info"]
+    message: str
+
+
+class BudgetAnalysis(BaseModel):
+    totalBudget: float
+    breakdown: list[BudgetLine]
+    flags: list[BudgetFlag]
+    summary: str = Field(description="Overall assessment including what was found and calculated")
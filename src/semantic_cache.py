@@ -0,0 +1,141 @@
+"""
+Whole-evaluation cache (enable with SEMANTIC_CACHE=1).
+
+Each finished evaluation is stored under a hash of the document's page texts. A later
+upload with the same content hash, under the same evaluation options and pipeline
+configuration (see `scope_key`), reuses the stored evaluation instead of running the
+pipeline. The lookup needs no embedding model, so it runs before any page is embedded.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+import orjson
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "0") == "1"
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_DB", os.path.join("cache", "semantic_cache.sqlite"))
+SEMANTIC_CACHE_MAX_ROWS = int(os.getenv("SEMANTIC_CACHE_ROWS", "500"))
+# Part of every scope; bump by hand after any scoring change `scope_key` cannot see
+# (e.g. the section/critique split in compute_weighted_score, or agent code)
+SEMANTIC_CACHE_VERSION = "v3"
+
+_conn: sqlite3.Connection | None = None
+_lock = threading.Lock()
+
+
+def content_hash(page_texts: list[str]) -> str:
+    """SHA-256 over the page texts, in order."""
+    digest = hashlib.sha256()
+    for text in page_texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def pipeline_version() -> str:
+    """
+    Hash of the configuration an evaluation depends on: prompts, response schemas, domain
+    rubrics and weights, decision thresholds and the LLM model.
+    """
+    from enum import Enum
+    from pydantic import BaseModel
+    from src import schemas
+    from src.config.decision_thresholds import ACCEPT_THRESHOLD, CONDITIONAL_THRESHOLD
+    from src.config.domain_rubrics import DOMAIN_RUBRICS
+    from src.config.domain_weights import DOMAIN_WEIGHTS
+    from src.llm_wrapper import DEFAULT_MODEL
+    from src.prompts import PROMPT_VERSION
+
+    schema_defs = {}
+    for name, obj in vars(schemas).items():
+        if isinstance(obj, type) and obj.__module__ == schemas.__name__:
+            if issubclass(obj, BaseModel):
+                schema_defs[name] = obj.model_json_schema()
+            elif issubclass(obj, Enum):
+                schema_defs[name] = [member.value for member in obj]
+
+    config = {
+        "prompts": PROMPT_VERSION,
+        "schemas": schema_defs,
+        "rubrics": dict(DOMAIN_RUBRICS),
+        "weights": {domain: dict(weights) for domain, weights in DOMAIN_WEIGHTS.items()},
+        "thresholds": [ACCEPT_THRESHOLD, CONDITIONAL_THRESHOLD],
+        "model": DEFAULT_MODEL,
+    }
+    return hashlib.sha256(orjson.dumps(config, option=orjson.OPT_SORT_KEYS)).hexdigest()[:16]
+
+
+def scope_key(**options) -> str:
+    """
+    Evaluations are only reused between runs with the same options and pipeline
+    configuration (see `pipeline_version`); anything else needs SEMANTIC_CACHE_VERSION bumped.
+    """
+    return orjson.dumps(
+        {"version": SEMANTIC_CACHE_VERSION, "pipeline": pipeline_version(), **options},
+        option=orjson.OPT_SORT_KEYS,
+    ).decode()
+
+
+def lookup(doc_hash: str, scope: str) -> dict | None:
+    """Return the stored evaluation of identical content, or None."""
+    try:
+        with _lock:
+            conn = _connection()
+            row = conn.execute(
+                "SELECT id, response FROM evaluations WHERE scope = ? AND content_hash = ?",
+                (scope, doc_hash),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE evaluations SET used = ? WHERE id = ?", (time.time(), row[0]))
+            conn.commit()
+        print("[INFO] Semantic cache hit (identical content)")
+        return orjson.loads(row[1])
+    except (sqlite3.Error, ValueError) as e:
+        print(f"[WARNING] Semantic cache read failed: {e}")
+        return None
+
+
+def store(doc_hash: str, scope: str, response: dict):
+    """Remember a finished evaluation; least recently used rows beyond the cap are evicted."""
+    try:
+        payload = orjson.dumps(response, option=orjson.OPT_SERIALIZE_NUMPY)
+        with _lock:
+            conn = _connection()
+            conn.execute(
+                "INSERT INTO evaluations (scope, content_hash, response, used) VALUES (?, ?, ?, ?)",
+                (scope, doc_hash, payload, time.time()),
+            )
+            conn.execute(
+                "DELETE FROM evaluations WHERE id IN "
+                "(SELECT id FROM evaluations ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (SEMANTIC_CACHE_MAX_ROWS,),
+            )
+            conn.commit()
+    except (sqlite3.Error, TypeError) as e:
+        print(f"[WARNING] Semantic cache write failed: {e}")
+
+
+def _connection() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(SEMANTIC_CACHE_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(SEMANTIC_CACHE_PATH, check_same_thread=False)
+        # Databases from before exact-match-only reuse stored an embedding per row; their
+        # scopes can no longer match, so the old table is dropped rather than migrated
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(evaluations)")}
+        if "embedding" in columns:
+            conn.execute("DROP TABLE evaluations")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS evaluations "
+            "(id INTEGER PRIMARY KEY, scope TEXT NOT NULL, content_hash TEXT NOT NULL, "
+            "response BLOB NOT NULL, used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS evaluations_scope_hash ON evaluations (scope, content_hash)")
+        conn.execute("CREATE INDEX IF NOT EXISTS evaluations_used ON evaluations (used)")
+        conn.commit()
+        _conn = conn
+    return _conn
@@ -1,51 +1,152 @@
 from langchain_community.vectorstores import Chroma
+import atexit
 import os
 import shutil
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+import chromadb
+from chromadb.config import Settings
 from langchain.schema import Document
 
-def create_vectorstore(docs: list[Document], embeddings, persist_dir=None):
+# One chromadb client per persist directory (None = in-memory), shared by every collection
+# created or opened there, so only the collection is new per proposal
+_clients: dict = {}
+_clients_lock = threading.Lock()
+# No anonymous usage events: each one is a network call from the evaluation thread
+_CLIENT_SETTINGS = Settings(anonymized_telemetry=False)
+
+# HNSW sized for one proposal (hundreds of chunks) instead of Chroma's general defaults:
+# a sparser graph that is quicker to build, and a search beam wide enough for the MMR
+# retriever's fetch_k=100 candidates (see vectorstore_agent)
+HNSW_COLLECTION_METADATA = {"hnsw:M": 8, "hnsw:construction_ef": 64, "hnsw:search_ef": 100}
+
+# Deletes renamed-away vectorstore directories off the caller's thread (see cleanup_vectorstore)
+_CLEANUP_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vs-gc")
+atexit.register(_CLEANUP_POOL.shutdown, wait=True)
+
+def create_vectorstore(docs: list[Document], embeddings, persist_dir=None, doc_embeddings=None, collection_name=None,
+                       replace=False):
     """
     Create a Chroma vectorstore from Document objects with metadata.
     
     If persist_dir is None, creates an in-memory vectorstore (recommended for evaluation isolation).
     If persist_dir is provided, persists to that directory.
     
-    ISOLATION: Each vectorstore gets a unique collection name to prevent contamination.
-    """
-    if persist_dir is None:
-        # In-memory mode with unique collection name for complete isolation
-        unique_collection_name = f"eval_{uuid.uuid4().hex[:16]}"
-        
-        db = Chroma.from_documents(
-            documents=docs,
-            embedding=embeddings,
-            collection_name=unique_collection_name
-        )
-    else:
-        # Persistent mode
+    If doc_embeddings is provided (one vector per document, e.g. from a single batched
+    embed_documents call), the vectors are written straight into the collection and
+    the embedder is only used later for queries.
+    
+    ISOLATION: Each vectorstore gets a unique collection name to prevent contamination,
+    unless the caller passes a content-derived `collection_name` (see open_cached_vectorstore).
+    Such a collection may already exist: chunks get deterministic ids and are upserted, so
+    concurrent or repeated builds of the same content never duplicate them, and
+    `replace=True` drops the existing collection first.
+    """
+    unique_collection_name = collection_name or f"eval_{uuid.uuid4().hex[:16]}"
+    
+    if persist_dir is not None:
         os.makedirs(persist_dir, exist_ok=True)
-        
-        unique_collection_name = f"eval_{uuid.uuid4().hex[:16]}"
-        
-        db = Chroma.from_documents(
-            documents=docs,        # <-- preserve text + metadata
-            embedding=embeddings,  
-            persist_directory=persist_dir,
-            collection_name=unique_collection_name
+    
+    # In-memory (persist_dir=None) or persistent, on the shared client for that location
+    client = _get_client(persist_dir)
+    if replace:
+        try:
+            client.delete_collection(unique_collection_name)
+        except Exception:
+            pass  # nothing to replace
+    db = Chroma(
+        client=client,
+        collection_name=unique_collection_name,
+        embedding_function=embeddings,
+        collection_metadata=HNSW_COLLECTION_METADATA
+    )
+    if not docs:
+        return db
+    ids = [f"{unique_collection_name}:{i}" for i in range(len(docs))]
+    if doc_embeddings is not None:
+        db._collection.upsert(
+            ids=ids,
+            documents=[d.page_content for d in docs],
+            metadatas=[d.metadata for d in docs],
+            embeddings=doc_embeddings
         )
+    else:
+        db.add_documents(docs, ids=ids)  # <-- preserve text + metadata (upserts by id)
     return db
 
 
+def _get_client(persist_dir):
+    """Return the shared chromadb client for `persist_dir` (None for in-memory)."""
+    with _clients_lock:
+        client = _clients.get(persist_dir)
+        if client is None:
+            if persist_dir is None:
+                client = chromadb.EphemeralClient(settings=_CLIENT_SETTINGS)
+            else:
+                client = chromadb.PersistentClient(path=persist_dir, settings=_CLIENT_SETTINGS)
+            _clients[persist_dir] = client
+        return client
+
+
+def open_cached_vectorstore(embeddings, persist_dir, collection_name):
+    """
+    Open a previously persisted, non-empty collection, or return None if there is none.
+    """
+    if not os.path.isdir(persist_dir):
+        return None
+    try:
+        db = Chroma(
+            client=_get_client(persist_dir),
+            collection_name=collection_name,
+            embedding_function=embeddings
+        )
+        if db._collection.count() > 0:
+            os.utime(persist_dir)  # recency for prune_vectorstore_cache
+            return db
+    except Exception as e:
+        print(f"[WARNING] Could not open cached vectorstore at {persist_dir}: {e}")
+    return None
+
+
+def prune_vectorstore_cache(cache_dir, max_entries, keep=None):
+    """
+    Delete the least recently used vectorstore directories under `cache_dir` beyond
+    `max_entries`, by directory mtime (open_cached_vectorstore refreshes it on every hit).
+    `keep` is never deleted.
+    """
+    try:
+        entries = [
+            entry for entry in os.scandir(cache_dir)
+            if entry.is_dir() and ".trash." not in entry.name and entry.path != keep
+        ]
+    except OSError:
+        return
+    if keep is not None:
+        max_entries -= 1
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[max(max_entries, 0):]:
+        print(f"[INFO] Evicting cached vectorstore {entry.path}")
+        cleanup_vectorstore(entry.path)
+
+
 def cleanup_vectorstore(persist_dir):
     """
     Delete a vectorstore directory to prevent contamination between evaluations.
+
+    The directory is renamed away first, so `persist_dir` is free again as soon as this
+    returns; the recursive delete runs in the background.
     """
+    with _clients_lock:
+        _clients.pop(persist_dir, None)
     if persist_dir and os.path.exists(persist_dir):
+        trash = f"{persist_dir.rstrip(os.sep)}.trash.{uuid.uuid4().hex[:8]}"
         try:
-            shutil.rmtree(persist_dir)
-        except Exception as e:
+            os.rename(persist_dir, trash)
+        except OSError as e:
             print(f"[WARNING] Could not clean up vectorstore at {persist_dir}: {e}")
+            return
+        _CLEANUP_POOL.submit(shutil.rmtree, trash, ignore_errors=True)
 
 
 def load_vectorstore(embedding, persist_dir="data/vectorstore"):
@@ -53,7 +154,7 @@ def load_vectorstore(embedding, persist_dir="data/vectorstore"):
     Load an existing Chroma vectorstore from disk.
     """
     db = Chroma(
-        embedding_function=embedding,  # LangChain embedding object
-        persist_directory=persist_dir
+        client=_get_client(persist_dir),
+        embedding_function=embedding  # LangChain embedding object
     )
     return db
\ No newline at end of file
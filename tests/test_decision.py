@@ -0,0 +1,29 @@
+import pytest
+from hypothesis import given
+from hypothesis.strategies import floats
+
+from src.config.decision_thresholds import ACCEPT_THRESHOLD, CONDITIONAL_THRESHOLD, decide
+
+
+@pytest.mark.parametrize(
+    "score, expected",
+    [
+        (5.999, "REJECT"),
+        (6.0, "CONDITIONALLY ACCEPT"),
+        (7.999, "CONDITIONALLY ACCEPT"),
+        (8.0, "ACCEPT"),
+    ],
+)
+def test_decide_thresholds(score, expected):
+    assert decide(score) == expected
+
+
+@given(floats(0, 10))
+def test_decide_bands(score):
+    if score >= ACCEPT_THRESHOLD:
+        expected = "ACCEPT"
+    elif score >= CONDITIONAL_THRESHOLD:
+        expected = "CONDITIONALLY ACCEPT"
+    else:
+        expected = "REJECT"
+    assert decide(score) == expected